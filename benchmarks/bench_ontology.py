@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the ontology generator.
+
+Runs generate_ontology and enhance_relationships end to end against a
+local mock Ollama, and extract_json_from_text and
+validate_ontology_connectivity in isolation. Reports throughput,
+p50/p95/p99 latency and peak traced memory per scenario, saves the results
+as JSON and optionally compares them against an earlier run.
+
+    python benchmarks/bench_ontology.py --iterations 20
+    python benchmarks/bench_ontology.py --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "llm"))
+sys.path.insert(0, BENCH_DIR)
+
+import mock_ollama
+import ontology_generator
+import ontology_graph
+import ontology_generator_windows
+
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def percentile(samples, pct):
+    """Linear-interpolated percentile of a list of numbers."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def measure(name, func, iterations, warmup=1):
+    """
+    Times `func(i)` over `iterations` calls, then runs it once more under
+    tracemalloc to record peak memory (tracing distorts timings, so it is kept
+    out of the timed loop).
+    """
+    for i in range(warmup):
+        func(-1 - i)
+
+    samples = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func(iterations)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "iterations": iterations,
+        "total_seconds": elapsed,
+        "throughput_per_second": iterations / elapsed if elapsed else 0.0,
+        "mean_ms": 1000 * sum(samples) / len(samples),
+        "p50_ms": 1000 * percentile(samples, 50),
+        "p95_ms": 1000 * percentile(samples, 95),
+        "p99_ms": 1000 * percentile(samples, 99),
+        "peak_memory_kb": peak / 1024
+    }
+    print(f"{name:48s} p50 {result['p50_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms  "
+          f"p99 {result['p99_ms']:9.2f} ms  {result['throughput_per_second']:9.1f}/s  "
+          f"peak {result['peak_memory_kb']:9.1f} KiB")
+    return result
+
+
+def synthetic_ontology(relationships, components):
+    """Builds an ontology of `relationships` edges split into `components` disconnected groups."""
+    rels = []
+    per_component = max(1, relationships // components)
+    for c in range(components):
+        for i in range(per_component):
+            rels.append({
+                "from": f"Entity {c}-{i}",
+                "to": f"Entity {c}-{(i * 7 + 1) % (per_component + 1)}",
+                "relationship": "relates to",
+                "fromCardinality": "1",
+                "toCardinality": "*",
+                "category": "associates-with"
+            })
+    return {"domain": "synthetic", "relationships": rels}
+
+
+def sample_texts():
+    ontology = json.dumps(mock_ollama.build_ontology("sample", 15))
+    return {
+        "clean": ontology,
+        "reasoning": "<think>\nConsider {entities} and [relationships] first.\n</think>\n" + ontology,
+        "code_fence": "Here is the ontology:\n```json\n" + ontology + "\n```\nLet me know if you need more.",
+        "malformed": ontology[:len(ontology) // 2]
+    }
+
+
+def run(args):
+    results = {}
+    cache_root = tempfile.mkdtemp(prefix="ontology-bench-")
+    config = mock_ollama.MockOllamaConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        malformed_rate=args.malformed_rate,
+        relationships=args.relationships,
+        seed=1
+    )
+
+    try:
+        with mock_ollama.MockOllama(config) as server:
+            clients = {
+                "linux": ontology_generator.OllamaClient(server.base_url, cache_dir=os.path.join(cache_root, "linux")),
+                "windows": ontology_generator_windows.OllamaClient(
+                    server.base_url, cache_dir=os.path.join(cache_root, "windows"), max_parallel=args.parallel
+                )
+            }
+
+            # Isolated, CPU-bound stages
+            for label, text in sample_texts().items():
+                client = clients["windows"]
+                results[f"extract_json_from_text[{label}]"] = measure(
+                    f"extract_json_from_text[{label}]",
+                    lambda i, text=text: client.extract_json_from_text(text, "sample"),
+                    args.iterations * 10
+                )
+
+            for size, components in ((15, 3), (500, 25), (5000, 100)):
+                ontology = synthetic_ontology(size, components)
+                name = f"validate_ontology_connectivity[{size} edges]"
+                results[name] = measure(
+                    name,
+                    lambda i, ontology=ontology: clients["windows"].validate_ontology_connectivity(copy.deepcopy(ontology)),
+                    max(3, args.iterations)
+                )
+                name = f"validate_ontology_connectivity[{size} edges, compact]"
+                results[name] = measure(
+                    name,
+                    lambda i, ontology=ontology: clients["windows"].validate_ontology_connectivity(ontology_graph.Ontology.from_dict(ontology)),
+                    max(3, args.iterations)
+                )
+
+            # End to end against the mock server
+            base = mock_ollama.build_ontology("benchmark", args.relationships)
+            results["enhance_relationships"] = measure(
+                "enhance_relationships",
+                lambda i: clients["windows"].enhance_relationships(copy.deepcopy(base)),
+                args.iterations
+            )
+
+            for variant, client in clients.items():
+                # a fresh domain per call so every iteration misses the cache
+                results[f"generate_ontology[{variant}, cold]"] = measure(
+                    f"generate_ontology[{variant}, cold]",
+                    lambda i, client=client, variant=variant: client.generate_ontology(f"{variant} domain {i}"),
+                    args.iterations
+                )
+                results[f"generate_ontology[{variant}, cached]"] = measure(
+                    f"generate_ontology[{variant}, cached]",
+                    lambda i, client=client, variant=variant: client.generate_ontology(f"{variant} domain 0"),
+                    args.iterations * 10
+                )
+
+            mock_requests = server.stats["requests"]
+    finally:
+        shutil.rmtree(cache_root, ignore_errors=True)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "iterations": args.iterations,
+            "latency": args.latency,
+            "tokens_per_second": args.tokens_per_second,
+            "malformed_rate": args.malformed_rate,
+            "relationships": args.relationships,
+            "parallel": args.parallel
+        },
+        "mock_requests": mock_requests,
+        "scenarios": results
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Prints p50/p95 changes against a baseline run; returns the names of regressed scenarios."""
+    regressions = []
+    print(f"\nComparison with baseline from {baseline.get('timestamp', 'unknown')} (tolerance {tolerance:.0f}%):")
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            print(f"  {name:48s} (new scenario)")
+            continue
+        changes = []
+        regressed = False
+        for metric in ("p50_ms", "p95_ms"):
+            if before[metric] > 0:
+                change = 100.0 * (result[metric] - before[metric]) / before[metric]
+                changes.append(f"{metric[:3]} {change:+7.1f}%")
+                regressed = regressed or change > tolerance
+        print(f"  {name:48s} {'  '.join(changes)}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ontology generator against a mock Ollama server')
+    parser.add_argument('--iterations', '-n', type=int, default=10, help='Timed iterations per end-to-end scenario (default: 10)')
+    parser.add_argument('--latency', type=float, default=0.02, help='Mock latency before the first token in seconds (default: 0.02)')
+    parser.add_argument('--tokens-per-second', type=float, default=0, help='Mock generation speed, 0 for instant (default: 0)')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Share of mock replies truncated mid-JSON (default: 0)')
+    parser.add_argument('--relationships', type=int, default=12, help='Relationships per mock ontology (default: 12)')
+    parser.add_argument('--parallel', type=int, default=1, help='Enrichment concurrency for the Windows client (default: 1)')
+    parser.add_argument('--output', metavar='FILE', help='Where to save results (default: benchmarks/results/bench-<timestamp>.json)')
+    parser.add_argument('--compare', metavar='FILE', help='Baseline results to compare against')
+    parser.add_argument('--tolerance', type=float, default=10.0, help='Percent p50/p95 slowdown reported as a regression (default: 10)')
+    parser.add_argument('--verbose', '-v', action='store_true', help="Show the generator's own log output")
+    args = parser.parse_args()
+
+    log = contextlib.nullcontext() if args.verbose else contextlib.redirect_stderr(io.StringIO())
+    with log:
+        current = run(args)
+
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
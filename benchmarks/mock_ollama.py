@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the parts of Ollama's API the generator uses
+(/api/tags and /api/generate, streaming or not).
+
+Latency before the first token, token rate and the share of malformed
+replies are configurable, so the generator can be benchmarked without a
+model. Run it standalone or start it in-process with MockOllama.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENTITIES = [
+    "Organization", "Department", "Employee", "Manager", "Project", "Task", "Customer", "Order",
+    "Product", "Invoice", "Payment", "Supplier", "Contract", "Location", "Asset", "Report",
+    "Policy", "Account", "Service", "Request", "Schedule", "Team", "Budget", "Document"
+]
+VERBS = ["manages", "contains", "owns", "requests", "produces", "approves", "uses", "assigns", "tracks", "pays"]
+CARDINALITIES = ["1", "0..1", "0..*", "*", "1..*"]
+CATEGORIES = ["is-a", "part-of", "has", "performs", "associates-with"]
+
+
+class MockOllamaConfig:
+
+    def __init__(self, latency=0.05, tokens_per_second=0, malformed_rate=0.0, relationships=12,
+                 reasoning=True, seed=None):
+        self.latency = latency                      # seconds before the first token
+        self.tokens_per_second = tokens_per_second  # 0 means replies are instant after latency
+        self.malformed_rate = malformed_rate        # share of replies truncated mid-JSON
+        self.relationships = relationships          # relationships per generated ontology
+        self.reasoning = reasoning                  # wrap replies in a <think> block like deepseek-r1
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def chance(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+
+def _estimate_tokens(text):
+    # roughly four characters per token for English text
+    return max(1, len(text) // 4)
+
+
+def build_ontology(domain, count, offset=0):
+    """
+    Builds a connected ontology with `count` relationships; a non-zero
+    `offset` continues the same sequence, as for an expansion request.
+    """
+    relationships = []
+    for i in range(offset, offset + count):
+        source = ENTITIES[i % len(ENTITIES)]
+        target = ENTITIES[(i + 1) % len(ENTITIES)] if i % 3 else ENTITIES[(i * 7 + 3) % len(ENTITIES)]
+        if target == source:
+            target = ENTITIES[(i + 2) % len(ENTITIES)]
+        relationships.append({
+            "from": source,
+            "to": target,
+            "relationship": VERBS[i % len(VERBS)],
+            "fromCardinality": CARDINALITIES[i % len(CARDINALITIES)],
+            "toCardinality": CARDINALITIES[(i + 2) % len(CARDINALITIES)],
+            "category": CATEGORIES[i % len(CATEGORIES)]
+        })
+    return {"domain": domain, "relationships": relationships}
+
+
+def build_concepts(domain, count):
+    """Builds a reply to a hierarchical generation's concepts prompt."""
+    concepts = ENTITIES[:count]
+    relationships = [
+        {"from": concepts[0], "to": concept, "relationship": VERBS[i % len(VERBS)]}
+        for i, concept in enumerate(concepts[1:])
+    ]
+    return {"domain": domain, "concepts": concepts, "relationships": relationships}
+
+
+def build_cluster(domain, concept, count):
+    """
+    Builds the relationships around one concept: the generic sequence with
+    every entity but the first renamed after the concept, so clusters only
+    share the concepts themselves (and repeat some relationships).
+    """
+    ontology = build_ontology(domain, count)
+    for rel in ontology["relationships"]:
+        for field in ("from", "to"):
+            if rel[field] == ENTITIES[0]:
+                rel[field] = concept
+            elif rel[field] not in (ENTITIES[1], ENTITIES[2]):
+                rel[field] = f"{concept} {rel[field]}"
+    return ontology
+
+
+def build_details(relationship_lines, define=None):
+    """
+    Builds enrichment entries; `define` optionally gives, per line, the
+    entity names whose definitions were asked for (both ends if None).
+    """
+    details = []
+    for i, line in enumerate(relationship_lines):
+        names = None if define is None else define[i]
+        entry = {"relationship": line}
+        if names is None or any(line.startswith(name + " ") for name in names):
+            entry["from_definition"] = f"The source entity of '{line}', described in two or three sentences."
+        if names is None or any(line.endswith(" " + name) for name in names):
+            entry["to_definition"] = f"The target entity of '{line}', described in two or three sentences."
+        entry.update({
+            "relationship_explanation": f"An explanation of how '{line}' works in practice and why.",
+            "examples": [f"A first example of {line}.", f"A second example of {line}."],
+            "significance": f"Why '{line}' matters in this domain."
+        })
+        details.append(entry)
+    return details
+
+
+def make_handler(config, stats):
+
+    class MockOllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith("/api/tags"):
+                self._send_json({"models": [{"name": "mock"}]})
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            if not self.path.startswith("/api/generate"):
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length", 0) or 0)
+            request = json.loads(self.rfile.read(length).decode("utf-8")) if length else {}
+            with stats["lock"]:
+                stats["requests"] += 1
+
+            text = self._reply_text(request)
+            prompt_tokens = _estimate_tokens(request.get("system", "") + request.get("prompt", ""))
+            eval_tokens = _estimate_tokens(text)
+            token_delay = 1.0 / config.tokens_per_second if config.tokens_per_second else 0
+
+            time.sleep(config.latency)
+            if request.get("stream"):
+                self._stream(text, token_delay, prompt_tokens, eval_tokens)
+                return
+
+            time.sleep(token_delay * eval_tokens)
+            self._send_json(dict(self._timings(prompt_tokens, eval_tokens, token_delay), response=text, done=True, model=request.get("model")))
+
+        def _reply_text(self, request):
+            prompt = request.get("prompt", "")
+            lines = re.findall(r"Relationship: (.*)", prompt)
+            entities = re.findall(r"^\s*Entity: (.*)$", prompt, re.MULTILINE)
+            if entities:
+                # definitions-only follow-up after a failed enrichment batch
+                payload = {"definitions": [
+                    {"entity": entity.strip(), "definition": f"{entity.strip()}, described in two or three sentences."}
+                    for entity in entities
+                ]}
+            elif lines:
+                define = re.findall(r"Define: (.*)", prompt)
+                if len(define) == len(lines):
+                    define = [[] if names.strip() == "none" else [n.strip() for n in names.split(",")] for names in define]
+                else:
+                    define = None
+                payload = build_details([line.strip() for line in lines], define)
+                if isinstance(request.get("format"), dict):
+                    payload = {"relationships": payload}
+            else:
+                domains = re.findall(r'domain of "([^"]+)"', prompt)
+                domain = domains[-1] if domains else "mock"
+                count = re.search(r"Identify the (\d+) most important top-level concepts", prompt)
+                focus = re.search(r'the part around the concept "([^"]+)"', prompt)
+                size = re.search(r"Create (\d+) meaningful relationships", prompt)
+                if count:
+                    payload = build_concepts(domain, int(count.group(1)))
+                elif focus:
+                    payload = build_cluster(domain, focus.group(1), int(size.group(1)) if size else config.relationships)
+                else:
+                    # expansion prompts list the existing relationships first
+                    existing = len(re.findall(r"^\s*- ", prompt, re.MULTILINE)) if "already contains" in prompt else 0
+                    payload = build_ontology(domain, config.relationships, existing)
+
+            text = json.dumps(payload)
+            if config.chance(config.malformed_rate):
+                text = text[:len(text) // 2]
+            if config.reasoning and not request.get("format"):
+                text = "<think>\nThinking about {entities} and [relationships].\n</think>\n" + text
+            return text
+
+        def _timings(self, prompt_tokens, eval_tokens, token_delay):
+            return {
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(config.latency * 1e9),
+                "eval_count": eval_tokens,
+                "eval_duration": int(token_delay * eval_tokens * 1e9),
+                "total_duration": int((config.latency + token_delay * eval_tokens) * 1e9)
+            }
+
+        def _stream(self, text, token_delay, prompt_tokens, eval_tokens):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def write_chunk(payload):
+                data = (json.dumps(payload) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            for i in range(0, len(text), 4):
+                if token_delay:
+                    time.sleep(token_delay)
+                write_chunk({"response": text[i:i + 4], "done": False})
+            write_chunk(dict(self._timings(prompt_tokens, eval_tokens, token_delay), response="", done=True))
+            self.wfile.write(b"0\r\n\r\n")
+
+    return MockOllamaHandler
+
+
+class MockOllama:
+    """Runs the mock server on a background thread; use as a context manager."""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or MockOllamaConfig()
+        self.stats = {"requests": 0, "lock": threading.Lock()}
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.config, self.stats))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock Ollama server for benchmarking the ontology generator')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds before the first token (default: 0.05)')
+    parser.add_argument('--tokens-per-second', type=float, default=0, help='Simulated generation speed, 0 for instant (default: 0)')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Share of replies truncated mid-JSON (default: 0)')
+    parser.add_argument('--relationships', type=int, default=12, help='Relationships per generated ontology (default: 12)')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    config = MockOllamaConfig(args.latency, args.tokens_per_second, args.malformed_rate, args.relationships, seed=args.seed)
+    server = MockOllama(config, args.host, args.port)
+    print(f"Mock Ollama listening on {server.base_url}", file=sys.stderr)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+asyncio front end for ontology_pipeline.OllamaClient.
+
+AsyncOllamaClient replaces only the calls to Ollama: they go through one
+shared aiohttp session, at most `concurrency` at a time, each with its own
+timeout, and are cancelled together with the task awaiting them. Prompts,
+JSON extraction, validation, connectivity repair, the definition store and
+the cache all come from the wrapped synchronous client, so both produce (and
+share) the same ontologies. One process can therefore keep hundreds of
+generations pending without a thread for each. The client's blocking calls
+(cache and definition store reads and writes, which may wait on file locks)
+run in the loop's default executor so they never stall other generations.
+Generations of one cache key are shared within the process and, through the
+synchronous client's SingleFlight lock files, with other processes.
+
+aiohttp is an optional dependency, needed only when this module is used.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import sys
+import threading
+import traceback
+
+import requests
+
+import ontology_hierarchy
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 120
+
+
+class _Flight:
+    """A generation shared by every coroutine asking for the same cache key."""
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncOllamaClient:
+
+    def __init__(self, client, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT):
+        if aiohttp is None:
+            raise ImportError("AsyncOllamaClient needs aiohttp (pip install aiohttp)")
+        self.client = client                # synchronous OllamaClient providing everything but HTTP
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout              # default seconds per Ollama call
+        self.loop = None
+        self.session = None
+        self.semaphore = None
+        self.flights = {}
+
+    async def _bind(self):
+        """
+        Creates the session and semaphore for the running event loop (again if
+        it changed, closing the session made for the previous loop).
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            old_session, old_loop = self.session, self.loop
+            self.loop = loop
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.concurrency))
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+            self.flights = {}
+            if old_session is not None:
+                await self._close_session(old_session, old_loop)
+
+    @staticmethod
+    async def _close_session(session, loop):
+        """Closes a session on the loop that created it if that loop still runs, else on this one."""
+        try:
+            if loop is not None and loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+            else:
+                await session.close()
+        except Exception as e:
+            print(f"Error closing previous HTTP session: {str(e)}", file=sys.stderr)
+
+    async def _run_blocking(self, func, *args):
+        """Runs a blocking call of the synchronous client in the default executor."""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+            self.loop = None
+
+    async def __aenter__(self):
+        await self._bind()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+    async def _post(self, payload, timeout=None):
+        """
+        Sends one /api/generate request to the client's least busy endpoint,
+        failing over like EndpointPool.post; returns (status, decoded reply or None).
+        """
+        await self._bind()
+        endpoints = self.client.endpoints
+        tried = []
+        async with self.semaphore:
+            while True:
+                with endpoints.acquire(tried) as endpoint:
+                    tried.append(endpoint)
+                    last = len(tried) == len(endpoints.endpoints)
+                    try:
+                        async with self.session.post(
+                            f"{endpoint.base_url}/api/generate",
+                            json=payload,
+                            timeout=aiohttp.ClientTimeout(total=timeout or self.timeout)
+                        ) as response:
+                            if response.status in (502, 503, 504) and not last:
+                                endpoints.mark_failed(endpoint)
+                                print(f"Ollama at {endpoint.base_url} answered {response.status}, trying the next endpoint", file=sys.stderr)
+                                continue
+                            if response.status != 200:
+                                return response.status, None
+                            return response.status, await response.json(content_type=None)
+                    except aiohttp.ClientConnectionError as e:
+                        # a slow answer is not a dead endpoint
+                        if isinstance(e, asyncio.TimeoutError) or last:
+                            raise
+                        endpoints.mark_failed(endpoint)
+                        print(f"Ollama at {endpoint.base_url} is unreachable, trying the next endpoint", file=sys.stderr)
+
+    def extract_json_from_text(self, text, domain=None, schema=None):
+        return self.client.extract_json_from_text(text, domain, schema)
+
+    async def generate_ontology(self, domain, num_ctx=4096, seed=None):
+        """
+        Returns the ontology for a domain, from the cache when possible.
+        Concurrent calls for the same domain share one generation, which is
+        cancelled once every caller waiting for it has been cancelled.
+        Expansion from a `seed` runs the synchronous client in a worker thread.
+        """
+        client = self.client
+        if seed is not None:
+            return await self._run_blocking(client.generate_ontology, domain, num_ctx, seed)
+
+        await self._bind()
+        caching = "cache" in client.stages
+        with client.metrics.trace(domain), client.metrics.span("generate_ontology"):
+            cache_key = client.cache_key(domain, num_ctx)
+            cached = None
+            if caching:
+                client.prefetcher.record(domain, num_ctx)
+                with client.metrics.span("cache_read"):
+                    cached = await self._run_blocking(client.cache.lookup, cache_key)
+            if cached is not None:
+                print(f"Loading ontology for '{domain}' from cache", file=sys.stderr)
+                if "enrich" in client.stages and client._lacks_details(cached):
+                    # cached by a lazy client; the synchronous client completes it in a worker thread
+                    ontology, _ = await self._run_blocking(client._fetch_details, domain, None, num_ctx)
+                    return ontology
+                return cached
+
+            stale = None
+            if caching and client.stale_while_revalidate:
+                stale = await self._run_blocking(client.cache.get_stale, cache_key)
+            if stale is not None:
+                # regenerated by the prefetcher's thread through the synchronous client
+                print(f"Serving stale ontology for '{domain}' and regenerating it in the background", file=sys.stderr)
+                client.prefetcher.revalidate(domain, num_ctx)
+                if "enrich" in client.stages and client._lacks_details(stale):
+                    return await self._run_blocking(client._complete_details, stale, domain, num_ctx)
+                return stale
+
+            flight = self.flights.get(cache_key)
+            if flight is None:
+                flight = _Flight(asyncio.ensure_future(self._generate_locked(domain, num_ctx, cache_key)))
+                self.flights[cache_key] = flight
+                flight.task.add_done_callback(lambda task: self.flights.pop(cache_key, None))
+            else:
+                print(f"Waiting for in-flight generation of '{cache_key}'", file=sys.stderr)
+
+            flight.waiters += 1
+            try:
+                return await asyncio.shield(flight.task)
+            except asyncio.CancelledError:
+                if flight.waiters == 1:
+                    flight.task.cancel()
+                raise
+            finally:
+                flight.waiters -= 1
+
+    async def _generate_locked(self, domain, num_ctx, cache_key):
+        """
+        Holds the cache key's lock file while generating, like SingleFlight.do,
+        so other processes wait instead of generating the same ontology. Once
+        the lock is held the cache is checked again, as another process may
+        have just written the entry.
+        """
+        client = self.client
+        lock = client.single_flight.file_lock(cache_key)
+        acquiring = asyncio.get_running_loop().run_in_executor(None, lock.__enter__)
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # the worker thread may still get the lock; release it once it does
+            acquiring.add_done_callback(lambda future: lock.__exit__(None, None, None))
+            raise
+        try:
+            if "cache" in client.stages:
+                cached = await self._run_blocking(client.cache.lookup, cache_key)
+                if cached is not None:
+                    print(f"Loading ontology for '{domain}' from cache, written while waiting", file=sys.stderr)
+                    return cached
+            return await self._generate_ontology(domain, num_ctx, cache_key)
+        finally:
+            lock.__exit__(None, None, None)
+
+    async def _generate_ontology(self, domain, num_ctx, cache_key):
+        """Runs the client's stages after the cache lookup, with the Ollama calls on the event loop"""
+        client = self.client
+        if ontology_hierarchy.is_hierarchical(client.relationship_target):
+            # one call per concept, already bounded by the client's max_parallel; run it like expansion
+            return await self._run_blocking(client._generate_ontology, domain, num_ctx, cache_key)
+        try:
+            # find a dead Ollama with the (briefly cached) health check, not a timeout per call
+            await self._run_blocking(client.endpoints.ensure)
+        except requests.exceptions.RequestException as e:
+            print(f"Error connecting to Ollama: {str(e)}", file=sys.stderr)
+            return {"domain": domain, "error": "Cannot connect to Ollama service", "relationships": []}
+        try:
+            print(f"Generating ontology for domain: {domain}", file=sys.stderr)
+            with client.metrics.span("prompt_build"):
+                system_prompt, user_prompt = client._build_ontology_prompts(domain)
+
+            with client.metrics.span("llm_generate"):
+                status, reply = await self._post(client._build_payload(system_prompt, user_prompt, {"num_ctx": num_ctx}, client.schema))
+            if status != 200:
+                print(f"Error response from Ollama: {status}", file=sys.stderr)
+                return client.create_fallback_ontology(domain)
+            client.metrics.record_ollama("generate", reply)
+
+            with client.metrics.span("json_extraction"):
+                ontology = client.extract_json_from_text(reply.get("response", ""), domain, client.schema if client.structured_output else None)
+            ontology = client._validate_ontology(ontology, domain)
+
+            if "enrich" in client.stages:
+                with client.metrics.span("enrichment", relationships=len(ontology["relationships"])):
+                    ontology = await self.enhance_relationships(ontology, num_ctx)
+
+            if "cache" in client.stages:
+                print(f"Writing ontology for '{domain}' to cache", file=sys.stderr)
+                with client.metrics.span("cache_write"):
+                    await self._run_blocking(client.cache.put, cache_key, ontology)
+            return ontology
+
+        # aiohttp's read timeouts are connection errors too, so check timeouts first
+        except asyncio.TimeoutError:
+            print(f"Timed out generating ontology for '{domain}'", file=sys.stderr)
+            return dict(client.create_fallback_ontology(domain), error=f"Ollama did not answer within {self.timeout} seconds")
+        except aiohttp.ClientConnectionError as e:
+            print(f"Error connecting to Ollama: {str(e)}", file=sys.stderr)
+            return {"domain": domain, "error": "Cannot connect to Ollama service", "relationships": []}
+        except Exception as e:
+            print(f"Error generating ontology: {str(e)}", file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+            return dict(client.create_fallback_ontology(domain), error=str(e))
+
+    async def enhance_relationships(self, ontology, num_ctx=4096):
+        """Adds details to every relationship, with all batches in flight at once (bounded by the semaphore)."""
+        client = self.client
+        print(f"Enhancing ontology with details for each relationship...", file=sys.stderr)
+        domain = ontology.get("domain", "unknown")
+        relationships = ontology.get("relationships", [])
+        if not relationships:
+            return ontology
+
+        # both read or write the definition store, which can wait on its file lock
+        batches, batch_needs, known = await self._run_blocking(client._plan_enrichment, domain, relationships, num_ctx)
+        learned = {}
+        retried = []
+        failures = []
+        await asyncio.gather(*(
+            self._enhance_batch(domain, batch, needs, learned, num_ctx, retried, failures)
+            for batch, needs in zip(batches, batch_needs)
+        ))
+
+        # entities whose batch failed are asked for once more, definitions only
+        missing = client._missing_definitions(relationships, known, learned)
+        if missing and await self._run_blocking(client._can_follow_up, missing, failures, (aiohttp.ClientError, asyncio.TimeoutError)):
+            await asyncio.gather(*(
+                self._define_entities(domain, chunk, learned, num_ctx)
+                for chunk in client._definition_chunks(missing, num_ctx)
+            ))
+        await self._run_blocking(client._finish_enrichment, domain, relationships, known, learned, retried)
+        return ontology
+
+    async def _define_entities(self, domain, entities, learned, num_ctx):
+        """Same as OllamaClient._define_entities; errors are logged, as the definitions are optional"""
+        client = self.client
+        try:
+            with client.metrics.span("llm_define", entities=len(entities)):
+                status, reply = await self._post(client._build_definitions_payload(domain, entities, num_ctx))
+            if status != 200:
+                print(f"Error response from Ollama for missing definitions: {status}", file=sys.stderr)
+                return
+            client.metrics.record_ollama("define", reply)
+            client._apply_definitions_reply(domain, entities, learned, reply)
+        except Exception as e:
+            print(f"Error requesting missing definitions: {str(e) or type(e).__name__}", file=sys.stderr)
+
+    async def _enhance_batch(self, domain, batch, needs, learned, num_ctx, retried, failures):
+        """Same retry rules as OllamaClient._enhance_batch"""
+        client = self.client
+        remaining = []
+        with client.metrics.span("enrichment_batch", size=len(batch), definitions=len(needs)):
+            try:
+                with client.metrics.span("llm_enrich"):
+                    status, reply = await self._post(client._build_enrichment_payload(domain, batch, needs, num_ctx))
+                if status != 200:
+                    raise Exception(f"LLM error {status}")
+                client.metrics.record_ollama("enrich", reply)
+                remaining = client._apply_enrichment_reply(domain, batch, needs, learned, reply)
+            except Exception as e:
+                print(f"Error enhancing relationship batch: {str(e) or type(e).__name__}", file=sys.stderr)
+                failures.append(e)
+                for rel in batch:
+                    client._add_default_details(rel)
+
+        if len(remaining) > 1:
+            retried.append(len(batch))
+            limit = client.enrichment_batch_size.shrink(len(batch))
+            print(f"Retrying {len(remaining)} relationships in smaller batches (limit now {limit})", file=sys.stderr)
+            half = (len(remaining) + 1) // 2
+            await asyncio.gather(
+                self._enhance_batch(domain, remaining[:half], needs, learned, num_ctx, retried, failures),
+                self._enhance_batch(domain, remaining[half:], needs, learned, num_ctx, retried, failures)
+            )
+        else:
+            for rel in remaining:
+                client._add_default_details(rel)
+
+
+class ThreadedAsyncClient:
+    """
+    Synchronous facade running an AsyncOllamaClient on its own event-loop
+    thread, so threaded callers such as the HTTP server share one connection
+    pool and concurrency limit. Everything except generate_ontology (cache,
+    metrics, stream_relationships, ...) is the wrapped synchronous client's.
+    """
+
+    def __init__(self, async_client):
+        self.async_client = async_client
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="ontology-async", daemon=True)
+        self.thread.start()
+
+    def generate_ontology(self, domain, num_ctx=4096, seed=None, timeout=None):
+        future = asyncio.run_coroutine_threadsafe(self.async_client.generate_ontology(domain, num_ctx, seed), self.loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.async_client.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def __getattr__(self, name):
+        return getattr(self.async_client.client, name)
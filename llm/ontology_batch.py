@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Batch generation of many domains in one process, e.g. to pre-warm the cache.
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def read_domains(source):
+    """
+    Reads one domain per line from a file path, or from stdin when source is "-".
+    Blank lines and lines starting with '#' are skipped.
+    """
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+
+
+class _BatchRecorder:
+    """Collects per-domain reports, writes ontologies to the output file and logs progress."""
+
+    def __init__(self, domains, output=None):
+        self.domains = domains
+        self.output = output
+        self.reports = [None] * len(domains)
+        self.finished = 0
+        self.lock = threading.Lock()
+
+    def record(self, index, started, ontology=None, error=None):
+        domain = self.domains[index]
+        relationships = 0
+        if ontology is not None:
+            error = ontology.get("error")
+            relationships = len(ontology.get("relationships", []))
+            if self.output is not None:
+                with self.lock:
+                    self.output.write(json.dumps(ontology) + "\n")
+                    self.output.flush()
+
+        report = {
+            "domain": domain,
+            "ok": error is None,
+            "seconds": round(time.monotonic() - started, 3),
+            "relationships": relationships
+        }
+        if error is not None:
+            report["error"] = error
+
+        with self.lock:
+            self.finished += 1
+            status = "ok" if error is None else f"FAILED ({error})"
+            print(f"[{self.finished}/{len(self.domains)}] {domain}: {report['seconds']}s, {relationships} relationships, {status}", file=sys.stderr)
+        self.reports[index] = report
+
+
+def run_batch(client, domains, num_ctx=4096, workers=1, output=None):
+    """
+    Generates an ontology for each domain with up to `workers` generations in
+    flight. Each ontology is written to `output` (a file object) as one JSON
+    line when given; results always land in the client's cache.
+    Returns a per-domain report in input order.
+    """
+    recorder = _BatchRecorder(domains, output)
+
+    def generate(index, domain):
+        started = time.monotonic()
+        try:
+            recorder.record(index, started, ontology=client.generate_ontology(domain, num_ctx))
+        except Exception as e:
+            recorder.record(index, started, error=str(e))
+
+    print(f"Generating {len(domains)} domains with {workers} worker(s)", file=sys.stderr)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(generate, i, domain) for i, domain in enumerate(domains)]
+        for future in as_completed(futures):
+            future.result()
+
+    return recorder.reports
+
+
+def run_batch_async(client, domains, num_ctx=4096, output=None):
+    """
+    Like run_batch, for an ontology_async.AsyncOllamaClient: every domain is
+    scheduled at once on one event loop, and the client's concurrency limit
+    decides how many Ollama calls are in flight.
+    """
+    recorder = _BatchRecorder(domains, output)
+
+    async def generate(index, domain):
+        started = time.monotonic()
+        try:
+            recorder.record(index, started, ontology=await client.generate_ontology(domain, num_ctx))
+        except Exception as e:
+            recorder.record(index, started, error=str(e))
+
+    async def generate_all():
+        try:
+            await asyncio.gather(*(generate(i, domain) for i, domain in enumerate(domains)))
+        finally:
+            await client.close()
+
+    print(f"Generating {len(domains)} domains with up to {client.concurrency} Ollama call(s) in flight", file=sys.stderr)
+    asyncio.run(generate_all())
+    return recorder.reports
+
+
+def summarize(reports, elapsed):
+    """Builds the end-of-run summary printed by the CLI."""
+    failures = [r for r in reports if not r["ok"]]
+    return {
+        "domains": len(reports),
+        "succeeded": len(reports) - len(failures),
+        "failed": len(failures),
+        "seconds": round(elapsed, 3),
+        "results": reports
+    }
@@ -0,0 +1,619 @@
+#!/usr/bin/env python3
+"""
+Two-tier ontology cache shared by both generator variants.
+
+An in-memory LRU sits in front of a directory of JSON files. Entries expire
+after an optional TTL, both tiers are bounded in size, and disk writes go
+through a temporary file and an atomic rename so concurrent readers never
+see a half-written ontology. With backend="sqlite" the disk tier is a single
+compressed database instead (see ontology_store), which also answers
+listings and graph-only reads without parsing details.
+
+With a similarity threshold, lookup() also serves the ontology of the most
+similar cached domain (see ontology_domains.DomainIndex) when the exact key
+misses.
+
+With keep_stale, expired entries stay on disk and get_stale() still returns
+them, as well as the last ontology cached for the same domain, context size
+and variant (generator preset and output shape) under an older model or
+prompt version, so callers can serve it while a fresh one is generated.
+
+SingleFlight coalesces concurrent generations of the same key, both between
+threads of one process and between processes sharing the cache directory.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import ontology_domains
+import ontology_store
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_MEMORY_ENTRIES = 128
+DEFAULT_DISK_ENTRIES = 1000
+DEFAULT_LOCK_TIMEOUT = 600
+# Disk tiers: one JSON file per entry, or one SQLite database (ontology_store)
+BACKENDS = ("files", "sqlite")
+
+
+def make_cache_key(domain, model, prompt_version, num_ctx, variant=""):
+    """
+    Builds the cache key; any change to the model, prompt, variant or context
+    window misses the cache. `variant` names what shapes the ontology besides
+    the prompt (the generator preset, hierarchical size, stages), so stale
+    entries are only ever served to clients expecting the same shape.
+    Spellings of a domain that differ only in case, punctuation, spacing or
+    plurals share a key (ontology_domains.domain_key).
+    """
+    return f"{model}|{prompt_version}|{variant}|{num_ctx}|{ontology_domains.domain_key(domain)}"
+
+
+class OntologyCache:
+
+    def __init__(self, cache_dir, ttl=None, max_entries=DEFAULT_DISK_ENTRIES, memory_entries=DEFAULT_MEMORY_ENTRIES,
+                 similarity=None, keep_stale=False, backend="files"):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()     # key -> (created, ontology)
+        self.lock = threading.Lock()
+        # serializes update() within the process; a lock file does so across processes
+        self.update_lock = threading.Lock()
+        self.keep_stale = keep_stale
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "similar_hits": 0, "stale_hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expired": 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # latest key written per (variant, context size, domain), for get_stale after a model or prompt change
+        self.latest_dir = os.path.join(self.cache_dir, "latest")
+        os.makedirs(self.latest_dir, exist_ok=True)
+        # single-file disk tier; None keeps one JSON file per entry
+        self.store = None
+        if backend == "sqlite":
+            store_path = os.path.join(self.cache_dir, ontology_store.DEFAULT_FILENAME)
+            migrate = not os.path.exists(store_path)
+            self.store = ontology_store.OntologyStore(store_path)
+            if migrate:
+                self._import_files()
+        elif backend != "files":
+            raise ValueError(f"Unknown cache backend: {backend}")
+        # near-duplicate domain lookup; None disables it
+        self.domains = None
+        if similarity is not None:
+            index_path = os.path.join(self.cache_dir, "domains.jsonl")
+            rebuild = not os.path.exists(index_path)
+            self.domains = ontology_domains.DomainIndex(index_path, similarity)
+            if rebuild:
+                self._index_existing()
+
+    def _path(self, key, directory=None):
+        # Hash the key so arbitrary domain strings never become file names
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(directory or self.cache_dir, f"{digest}.json")
+
+    def _latest_path(self, key):
+        # make_cache_key puts model and prompt version before variant, context size and domain
+        return self._path(key.split("|", 2)[-1], self.latest_dir)
+
+    def _read_envelope(self, path):
+        """Returns the decoded cache file at `path`, or None if it is missing or unreadable."""
+        try:
+            with open(path, "r") as f:
+                envelope = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return envelope if isinstance(envelope, dict) else None
+
+    def _write_json(self, path, data):
+        """Atomically replaces `path` with `data` as JSON; raises on errors."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            # mkstemp creates owner-only files; the web server user may need to read them
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+
+    def _entry_files(self):
+        try:
+            return [e for e in os.scandir(self.cache_dir) if e.name.endswith(".json") and not e.name.startswith(".")]
+        except OSError:
+            return []
+
+    def _load(self, key, details=True):
+        """
+        Returns the disk envelope ({"key", "created", "ontology"}) for a key,
+        or None if there is none or it is unreadable. With details=False the
+        store skips relationship details; JSON files are always read whole.
+        """
+        if self.store is not None:
+            try:
+                return self.store.get(key, details)
+            except (sqlite3.Error, ValueError, zlib.error) as e:
+                print(f"Error loading from cache: {str(e)}, regenerating", file=sys.stderr)
+                return None
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                envelope = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error loading from cache: {str(e)}, regenerating", file=sys.stderr)
+            return None
+        return envelope if isinstance(envelope, dict) and envelope.get("key") == key else None
+
+    def _save(self, key, envelope):
+        """Writes an envelope to the disk tier and points the key's latest entry at it; raises on errors."""
+        scope = key.split("|", 2)[-1]
+        if self.store is not None:
+            self.store.put(key, envelope["created"], envelope["ontology"], scope)
+            return
+        self._write_json(self._path(key), envelope)
+        self._write_json(self._latest_path(key), {"key": key})
+
+    def _discard(self, key):
+        if self.store is not None:
+            try:
+                self.store.delete(key)
+            except sqlite3.Error:
+                pass
+        else:
+            self._remove(self._path(key))
+
+    def _touch(self, key):
+        """Marks a disk entry as used so eviction drops the least recently used ones."""
+        try:
+            if self.store is not None:
+                self.store.touch(key)
+            else:
+                os.utime(self._path(key), None)
+        except (OSError, sqlite3.Error):
+            pass
+
+    def _latest_key(self, key):
+        """Key last cached for the same variant, context size and domain as `key`, or None."""
+        if self.store is not None:
+            try:
+                return self.store.latest(key.split("|", 2)[-1])
+            except sqlite3.Error:
+                return None
+        pointer = self._read_envelope(self._latest_path(key))
+        return pointer.get("key") if pointer is not None and isinstance(pointer.get("key"), str) else None
+
+    def _forget_latest(self, key):
+        if self.store is not None:
+            try:
+                self.store.forget_latest(key.split("|", 2)[-1])
+            except sqlite3.Error:
+                pass
+        else:
+            self._remove(self._latest_path(key))
+
+    def _import_files(self):
+        """Moves the JSON entries of the cache directory into a new store."""
+        imported = 0
+        for entry in self._entry_files():
+            envelope = self._read_envelope(entry.path)
+            if envelope is None or not isinstance(envelope.get("key"), str) or "ontology" not in envelope:
+                continue
+            try:
+                self.store.put(envelope["key"], envelope.get("created", 0), envelope["ontology"], envelope["key"].split("|", 2)[-1])
+            except sqlite3.Error as e:
+                print(f"Error importing cache file {entry.name}: {str(e)}", file=sys.stderr)
+                continue
+            self._remove(entry.path)
+            imported += 1
+        if imported:
+            print(f"Moved {imported} cached ontologies into {self.store.path}", file=sys.stderr)
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def _remember(self, key, created, ontology):
+        with self.lock:
+            self.memory[key] = (created, ontology)
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        Returns the cached ontology for a key, or None on a miss or expired entry.
+        The returned object is shared with the memory tier and must not be mutated.
+        """
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if self._expired(entry[0]):
+                    del self.memory[key]
+                else:
+                    self.memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return entry[1]
+
+        envelope = self._load(key)
+        if envelope is None:
+            self._count("misses")
+            return None
+
+        if self._expired(envelope.get("created", 0)):
+            self._count("expired")
+            if not self.keep_stale:
+                self._discard(key)
+            self._count("misses")
+            return None
+
+        self._touch(key)
+        self._remember(key, envelope["created"], envelope["ontology"])
+        self._count("disk_hits")
+        return envelope["ontology"]
+
+    def lookup(self, key):
+        """
+        Returns get(key), or on a miss the ontology cached for the most similar
+        domain when a similarity threshold is set; None if neither exists.
+        """
+        ontology = self.get(key)
+        if ontology is not None or self.domains is None:
+            return ontology
+        match = self.domains.match(key)
+        if match is None:
+            return None
+        similar_key, score = match
+        ontology = self.get(similar_key)
+        if ontology is not None:
+            print(f"Serving '{similar_key}' for '{key}' (similarity {score:.2f})", file=sys.stderr)
+            self._count("similar_hits")
+        return ontology
+
+    def contains(self, key):
+        """True if a fresh entry exists for the key; unlike get(), counts nothing."""
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and not self._expired(entry[0]):
+                return True
+        if self.store is not None:
+            try:
+                created = self.store.created(key)
+            except sqlite3.Error:
+                return False
+            return created is not None and not self._expired(created)
+        envelope = self._load(key)
+        return envelope is not None and not self._expired(envelope.get("created", 0))
+
+    def get_graph(self, key):
+        """
+        Returns the cached ontology for a key without relationship details, or
+        None on a miss or expired entry; counts nothing. With the SQLite store
+        the details are never read from disk.
+        """
+        with self.lock:
+            entry = self.memory.get(key)
+        if entry is not None and not self._expired(entry[0]):
+            return ontology_store.split_details(entry[1])[0]
+        envelope = self._load(key, details=False)
+        if envelope is None or self._expired(envelope.get("created", 0)):
+            return None
+        ontology = envelope.get("ontology")
+        return ontology_store.split_details(ontology)[0] if self.store is None else ontology
+
+    def get_stale(self, key):
+        """
+        Returns the ontology cached for the key even if it has expired, else
+        the last one cached for the same domain, context size and variant under
+        another model or prompt version; None if there is neither.
+        """
+        with self.lock:
+            entry = self.memory.get(key)
+        if entry is not None:
+            self._count("stale_hits")
+            return entry[1]
+
+        envelope = self._load(key)
+        if envelope is None:
+            latest_key = self._latest_key(key)
+            if latest_key is None:
+                return None
+            envelope = self._load(latest_key)
+            if envelope is None:
+                # the entry it pointed to has been evicted
+                self._forget_latest(key)
+                return None
+        self._count("stale_hits")
+        return envelope.get("ontology")
+
+    def _index_existing(self):
+        """Adds the keys of the entries already on disk to a new domain index."""
+        if self.store is not None:
+            try:
+                keys = self.store.keys()
+            except sqlite3.Error:
+                return
+            for key in keys:
+                self.domains.add(key)
+            return
+        for entry in self._entry_files():
+            try:
+                with open(entry.path, "r") as f:
+                    key = json.load(f).get("key")
+            except (OSError, ValueError, AttributeError):
+                continue
+            if isinstance(key, str):
+                self.domains.add(key)
+
+    def update(self, key, change):
+        """
+        Applies `change` to a private copy of the ontology stored for a key and
+        stores what it returns, without resetting the entry's age. Concurrent
+        updates, from threads or processes, are applied one after another so
+        none is lost. Returns the stored ontology, or None if there is no
+        entry on disk for the key (expired entries included).
+        """
+        lock_dir = os.path.join(self.cache_dir, ".locks")
+        os.makedirs(lock_dir, exist_ok=True)
+        with self.update_lock, FileLock(self._path(key, lock_dir)[:-len(".json")] + ".update.lock"):
+            # a freshly decoded entry is not shared with the memory tier
+            envelope = self._load(key)
+            if envelope is None:
+                return None
+            ontology = change(envelope.get("ontology"))
+            self.put(key, ontology, created=envelope.get("created"))
+            return ontology
+
+    def put(self, key, ontology, created=None):
+        """
+        Stores an ontology in both tiers, as created at `created` (default: now).
+        Disk errors are logged, never raised.
+        """
+        created = created or time.time()
+        self._remember(key, created, ontology)
+
+        envelope = {"key": key, "created": created, "ontology": ontology}
+        try:
+            self._save(key, envelope)
+            self._count("writes")
+        except Exception as e:
+            print(f"Error writing to cache: {str(e)}", file=sys.stderr)
+            return
+
+        if self.domains is not None:
+            self.domains.add(key)
+
+        self._evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Removes the least recently used entries once the disk tier exceeds max_entries."""
+        if not self.max_entries:
+            return
+        if self.store is not None:
+            try:
+                removed = self.store.evict(self.max_entries)
+            except sqlite3.Error as e:
+                print(f"Error evicting from cache: {str(e)}", file=sys.stderr)
+                return
+            with self.lock:
+                self.counters["evictions"] += removed
+            return
+        entries = self._entry_files()
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=self._mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            self._remove(entry.path)
+            self._count("evictions")
+
+    def _mtime(self, entry):
+        try:
+            return entry.stat().st_mtime
+        except OSError:
+            return 0
+
+    def entries(self, prefix=None, limit=None, offset=0):
+        """
+        Lists the disk entries, most recently used first: key, domain,
+        created, accessed, number of relationships, number with details and
+        size in bytes. The store answers from its index; the files tier has
+        to read every file. `prefix` restricts the keys, e.g. to one model.
+        """
+        if self.store is not None:
+            return self.store.entries(prefix, limit, offset)
+        listed = []
+        for entry in self._entry_files():
+            envelope = self._read_envelope(entry.path)
+            key = envelope.get("key") if envelope is not None else None
+            if not isinstance(key, str) or (prefix and not key.startswith(prefix)):
+                continue
+            ontology = envelope.get("ontology") if isinstance(envelope.get("ontology"), dict) else {}
+            relationships = ontology.get("relationships") if isinstance(ontology.get("relationships"), list) else []
+            listed.append({
+                "key": key,
+                "domain": str(ontology.get("domain", "")),
+                "created": envelope.get("created", 0),
+                "accessed": self._mtime(entry),
+                "relationships": len(relationships),
+                "detailed": sum(1 for rel in relationships if isinstance(rel, dict) and "details" in rel),
+                "bytes": entry.stat().st_size
+            })
+        listed.sort(key=lambda item: -item["accessed"])
+        return listed[offset:] if limit is None else listed[offset:offset + limit]
+
+    def compact(self):
+        """
+        Removes expired entries (when a TTL is set) and latest-entry pointers
+        to missing entries, and with the SQLite store rewrites the database to
+        reclaim their space. Returns a summary.
+        """
+        expired_before = time.time() - self.ttl if self.ttl is not None else None
+        with self.lock:
+            self.memory.clear()
+        if self.store is not None:
+            return self.store.compact(expired_before)
+
+        removed = 0
+        for entry in self._entry_files():
+            envelope = self._read_envelope(entry.path)
+            if envelope is None or (expired_before is not None and envelope.get("created", 0) < expired_before):
+                self._remove(entry.path)
+                removed += 1
+        try:
+            pointers = list(os.scandir(self.latest_dir))
+        except OSError:
+            pointers = []
+        for entry in pointers:
+            pointer = self._read_envelope(entry.path)
+            if pointer is None or self._load(str(pointer.get("key"))) is None:
+                self._remove(entry.path)
+        return {"removed": removed, "entries": len(self._entry_files())}
+
+    def stats(self):
+        """Returns a snapshot of hit/miss counters and tier sizes."""
+        with self.lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self.memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        if self.domains is not None:
+            stats["indexed_domains"] = self.domains.size()
+        return stats
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a file, usable across processes.
+    Acquisition gives up after `timeout` seconds (None waits forever);
+    `acquired` tells the caller whether the lock is actually held.
+    """
+
+    def __init__(self, path, timeout=DEFAULT_LOCK_TIMEOUT, poll_interval=0.1):
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.handle = None
+        self.acquired = False
+
+    def _try_lock(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                self.handle.seek(0)
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def __enter__(self):
+        self.handle = open(self.path, "a+")
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not self._try_lock():
+            if deadline is not None and time.monotonic() >= deadline:
+                print(f"Timed out waiting for lock {self.path}, continuing without it", file=sys.stderr)
+                return self
+            time.sleep(self.poll_interval)
+        self.acquired = True
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.acquired:
+                if fcntl is not None:
+                    fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+                else:
+                    self.handle.seek(0)
+                    msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.handle.close()
+            self.acquired = False
+        return False
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time.
+
+    Threads in the same process that ask for a key already being computed wait
+    for the leader and share its result. The leader also holds a lock file in
+    `<cache_dir>/.locks`, so other processes wait too; once they get the lock
+    they re-check the cache through `lookup` before computing.
+    """
+
+    def __init__(self, cache_dir, lock_timeout=DEFAULT_LOCK_TIMEOUT):
+        self.lock_dir = os.path.join(cache_dir, ".locks")
+        self.lock_timeout = lock_timeout
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.coalesced = 0
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+    def _lock_path(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.lock_dir, f"{digest}.lock")
+
+    def file_lock(self, key):
+        """The cross-process lock a leader holds while computing `key`, for callers that coalesce in-process themselves."""
+        return FileLock(self._lock_path(key), self.lock_timeout)
+
+    def do(self, key, compute, lookup=None):
+        """Returns lookup() or compute() for a key, sharing one call between concurrent callers."""
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self.flights[key] = flight
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            print(f"Waiting for in-flight generation of '{key}'", file=sys.stderr)
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            with FileLock(self._lock_path(key), self.lock_timeout):
+                result = lookup() if lookup is not None else None
+                if result is None:
+                    result = compute()
+            flight.result = result
+            return result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Entity definitions shared between the relationships of an ontology and
+between runs.
+
+Enrichment used to ask the model to define both ends of every relationship,
+so a hub entity was defined once per relationship it takes part in, and again
+on every run. DefinitionStore keeps one definition per (domain, entity),
+persisted as one JSON file per domain in a directory next to the ontology
+cache, so enrichment only has to ask for the definitions it does not have.
+
+Definitions are scoped by the model and prompt version that wrote them, so
+switching either starts from an empty store. Each domain keeps at most
+`max_entities` definitions (the most recently written) and the directory at
+most `max_domains` files (the most recently written).
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+import ontology_cache
+import ontology_domains
+
+DEFAULT_MAX_DOMAINS = 1000
+DEFAULT_MAX_ENTITIES = 2000
+# domains whose definitions stay in memory
+DEFAULT_MEMORY_DOMAINS = 64
+
+
+def normalize(name):
+    """Key form of a domain or entity name: case and surrounding whitespace are ignored."""
+    return " ".join(str(name).split()).lower()
+
+
+def _mtime(entry):
+    try:
+        return entry.stat().st_mtime
+    except OSError:
+        return 0
+
+
+class DefinitionStore:
+
+    def __init__(self, directory, scope="", max_domains=DEFAULT_MAX_DOMAINS, max_entities=DEFAULT_MAX_ENTITIES,
+                 memory_domains=DEFAULT_MEMORY_DOMAINS):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.scope = scope                  # model and prompt version the definitions belong to
+        self.max_domains = max_domains
+        self.max_entities = max_entities
+        self.memory_domains = memory_domains
+        self.lock = threading.Lock()
+        self.domains = OrderedDict()        # scoped domain key -> {normalized entity: definition}, least recently used first
+
+    def _key(self, domain):
+        return f"{self.scope}|{ontology_domains.domain_key(domain)}"
+
+    def _path(self, domain):
+        digest = hashlib.sha256(domain.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def _read(self, domain):
+        try:
+            with open(self._path(domain), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        entities = data.get("entities") if isinstance(data, dict) else None
+        return entities if isinstance(entities, dict) else {}
+
+    def _load(self, domain):
+        """Returns the definitions of a domain, reading its file on first use (lock held)."""
+        if domain in self.domains:
+            self.domains.move_to_end(domain)
+        else:
+            self._remember(domain, self._read(domain))
+        return self.domains[domain]
+
+    def _remember(self, domain, entities):
+        """Keeps a domain's definitions in memory, forgetting the least recently used domains (lock held)."""
+        self.domains[domain] = entities
+        self.domains.move_to_end(domain)
+        while len(self.domains) > self.memory_domains:
+            self.domains.popitem(last=False)
+
+    def _cap(self, entities):
+        """Drops the oldest definitions beyond max_entities; dicts keep insertion order."""
+        excess = len(entities) - self.max_entities if self.max_entities else 0
+        for entity in list(entities)[:max(0, excess)]:
+            del entities[entity]
+        return entities
+
+    def _evict(self):
+        """Removes the least recently written domain files beyond max_domains."""
+        if not self.max_domains:
+            return
+        try:
+            files = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json") and not entry.name.startswith(".tmp-")]
+        except OSError:
+            return
+        if len(files) <= self.max_domains:
+            return
+        files.sort(key=_mtime)
+        for entry in files[:len(files) - self.max_domains]:
+            for path in (entry.path, entry.path + ".lock"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def lookup(self, domain, entities):
+        """Returns {entity: definition} for those of `entities` that have a stored definition."""
+        domain = self._key(domain)
+        with self.lock:
+            known = self._load(domain)
+            return {entity: known[normalize(entity)] for entity in entities if normalize(entity) in known}
+
+    def update(self, domain, definitions):
+        """
+        Adds {entity: definition} pairs for a domain and writes them to disk.
+        The file is re-read under a lock first, so definitions written by other
+        processes in the meantime are kept. Disk errors are logged, never raised.
+        """
+        definitions = {normalize(entity): text for entity, text in definitions.items() if text}
+        if not definitions:
+            return
+        domain = self._key(domain)
+        path = self._path(domain)
+
+        with self.lock:
+            try:
+                with ontology_cache.FileLock(path + ".lock"):
+                    entities = self._read(domain)
+                    for entity, text in definitions.items():
+                        # rewritten definitions move to the end, so capping drops the oldest
+                        entities.pop(entity, None)
+                        entities[entity] = text
+                    self._cap(entities)
+                    fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=".json")
+                    try:
+                        with os.fdopen(fd, "w", encoding="utf-8") as f:
+                            json.dump({"domain": domain, "entities": entities}, f)
+                        os.chmod(tmp_path, 0o644)
+                        os.replace(tmp_path, path)
+                    except BaseException:
+                        try:
+                            os.remove(tmp_path)
+                        except OSError:
+                            pass
+                        raise
+                self._remember(domain, entities)
+            except Exception as e:
+                print(f"Error writing entity definitions: {str(e)}", file=sys.stderr)
+                entities = self._load(domain)
+                entities.update(definitions)
+                self._cap(entities)
+                return
+            self._evict()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Domain name normalization and near-duplicate lookup for the ontology cache.
+
+domain_key() folds the spellings users type for the same domain ("Health
+Care", "healthcare", "health-care ", "Health Cares") into one cache key:
+case, compatibility forms, punctuation, whitespace and regular English
+plurals are ignored. Letters of every script are kept, and symbols that
+tell domains apart ("C++", "C#") become words, so distinct domains never
+share a key.
+
+DomainIndex goes one step further for spellings that still differ (typos,
+"software engineer" / "software engineering"): it keeps a character-trigram
+vector of every cached domain key and finds the most similar one by cosine
+similarity. With NumPy installed the vectors are hashed into fixed-size rows
+of one matrix and scored with a single matrix product; without it sparse
+dicts are compared one by one, which is fast enough for a few thousand
+domains.
+
+The index is persisted as an append-only file of cache keys next to the
+cache, so every process sharing a cache directory sees the others' entries.
+"""
+import json
+import re
+import sys
+import threading
+import unicodedata
+import zlib
+from collections import Counter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NGRAM = 3
+# Dimension of the hashed trigram vectors used with NumPy
+HASHED_DIMENSION = 4096
+# Trigram cosine similarity; typos of a domain score about 0.8-0.9, related
+# but distinct domains ("chemistry" / "biochemistry") below 0.8
+DEFAULT_SIMILARITY = 0.8
+
+_WORD = re.compile(r"[^\W_]+")
+# Symbols that distinguish names ("C++", "C#", "R&D"); other punctuation only separates words
+_SYMBOL_WORDS = {"+": " plus ", "#": " sharp ", "&": " and ", "@": " at ", "%": " percent "}
+_SYMBOLS = re.compile("[" + re.escape("".join(_SYMBOL_WORDS)) + "]")
+# Words ending like plurals that are not plurals of a shorter word
+_NOT_PLURAL = frozenset((
+    "news", "series", "species", "means", "lens", "gas", "bus", "canvas", "atlas", "chaos",
+    "always", "perhaps", "whereas", "its", "has", "was", "does", "goes", "aids", "sales",
+    "politics", "economics", "physics", "mathematics", "ethics", "statistics", "logistics",
+    "electronics", "genetics", "graphics", "robotics", "athletics", "linguistics", "analytics",
+))
+# Singulars ending in -ie, whose plural is not -y -> -ies
+_IE_SINGULARS = frozenset((
+    "movie", "cookie", "rookie", "zombie", "selfie", "calorie", "prairie", "goalie", "hippie",
+    "brownie", "smoothie", "sortie", "genie", "pixie", "eerie", "auntie", "newbie", "birdie",
+))
+# Singulars ending in -us or -as, whose plural adds -es ("buses"); other -uses/-ases words drop only the s ("houses")
+_ES_SINGULARS = frozenset((
+    "bus", "gas", "bias", "alias", "atlas", "canvas", "status", "virus", "campus", "bonus",
+    "census", "consensus", "corpus", "focus", "genus", "nexus", "plus", "surplus", "syllabus",
+    "prospectus", "apparatus", "circus", "citrus", "lotus", "octopus", "radius", "stimulus",
+    "thesaurus", "walrus", "hiatus", "chorus", "sinus", "abacus", "cactus", "fungus", "onus",
+))
+# Singulars ending in -che, whose plural drops only the s
+_CHE_SINGULARS = frozenset((
+    "cache", "niche", "headache", "ache", "avalanche", "cliche", "psyche", "moustache",
+    "mustache", "panache", "quiche", "creche", "attache", "microfiche",
+))
+
+
+def singular(word):
+    """
+    Strips a regular English plural ending from a lower-case word; good
+    enough for keys, not for display. Words that only look plural ("news",
+    "physics") and words outside plain ASCII letters are left alone, and
+    the endings whose singular is ambiguous ("movies", "buses", "caches",
+    "sizes") are resolved with the small word lists above.
+    """
+    if len(word) <= 3 or not (word.isascii() and word.isalpha()) or word in _NOT_PLURAL or word.endswith("ics"):
+        return word
+    if word.endswith("ies"):
+        # "ties", "pies" and the -ie nouns keep their e
+        return word[:-1] if len(word) <= 4 or word[:-1] in _IE_SINGULARS else word[:-3] + "y"
+    if word.endswith("ses"):
+        if word.endswith("sses") or word[:-2] in _ES_SINGULARS:
+            return word[:-2]
+        return word[:-1]
+    if word.endswith(("shes", "xes")):
+        return word[:-2]
+    if word.endswith("ches"):
+        return word[:-1] if word[:-1] in _CHE_SINGULARS else word[:-2]
+    if word.endswith("zzes"):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def normalize_text(text):
+    """NFKC-normalized, case-folded text with distinguishing symbols spelled out as words."""
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    return _SYMBOLS.sub(lambda match: _SYMBOL_WORDS[match.group(0)], text)
+
+
+def domain_words(domain):
+    """Case-folded words (letters of any script and digits) of a domain name with plurals folded."""
+    return [singular(word) for word in _WORD.findall(normalize_text(domain))]
+
+
+def domain_key(domain):
+    """
+    Canonical form of a domain name for cache keys. Word boundaries are
+    dropped too, so "health care" and "healthcare" share a key.
+    """
+    words = domain_words(domain)
+    return "".join(words) if words else unicodedata.normalize("NFKC", str(domain)).strip().casefold()
+
+
+def _ngrams(key):
+    padded = f"#{key}#"
+    return Counter(padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1)))
+
+
+def _sparse_vector(key):
+    """Trigram counts scaled to unit length."""
+    counts = _ngrams(key)
+    norm = sum(count * count for count in counts.values()) ** 0.5
+    return {gram: count / norm for gram, count in counts.items()}
+
+
+def _hashed_vector(key):
+    vector = numpy.zeros(HASHED_DIMENSION, dtype=numpy.float32)
+    for gram, count in _ngrams(key).items():
+        vector[zlib.crc32(gram.encode("utf-8")) % HASHED_DIMENSION] += count
+    return vector / numpy.linalg.norm(vector)
+
+
+class _Scope:
+    """The domains cached for one (model, prompt version, context) prefix."""
+
+    def __init__(self):
+        self.keys = []          # domain keys, in insertion order
+        self.positions = {}     # domain key -> index in keys
+        self.vectors = []       # sparse vectors (pure Python)
+        self.matrix = None      # hashed vectors, one row per key plus spare rows (NumPy)
+
+
+class DomainIndex:
+    """
+    Similarity index over the domain part of cache keys built by
+    ontology_cache.make_cache_key. Only keys with the same prefix (model,
+    prompt version, variant, context size) are compared with each other.
+    """
+
+    def __init__(self, path, threshold=DEFAULT_SIMILARITY):
+        self.path = path
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.scopes = {}
+        self.offset = 0         # bytes of the index file already read
+
+    def _insert(self, cache_key):
+        """Adds a cache key to the in-memory index (lock held)."""
+        prefix, _, key = cache_key.rpartition("|")
+        scope = self.scopes.setdefault(prefix, _Scope())
+        if key in scope.positions:
+            return False
+        scope.positions[key] = len(scope.keys)
+        scope.keys.append(key)
+        if numpy is not None:
+            # Grow the matrix by doubling so adding n keys copies O(n) rows
+            if scope.matrix is None or len(scope.keys) > len(scope.matrix):
+                grown = numpy.zeros((max(16, 2 * len(scope.keys)), HASHED_DIMENSION), dtype=numpy.float32)
+                if scope.matrix is not None:
+                    grown[:len(scope.matrix)] = scope.matrix
+                scope.matrix = grown
+            scope.matrix[len(scope.keys) - 1] = _hashed_vector(key)
+        else:
+            scope.vectors.append(_sparse_vector(key))
+        return True
+
+    def _refresh(self):
+        """Reads entries other processes appended to the index file since the last call (lock held)."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            return
+        # Leave a partially written last line for the next refresh
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                self._insert(json.loads(line)["key"])
+            except (ValueError, KeyError, TypeError):
+                continue
+        self.offset += end
+
+    def add(self, cache_key):
+        """Records a cached key, in memory and in the index file. Disk errors are logged, never raised."""
+        with self.lock:
+            self._refresh()
+            if not self._insert(cache_key):
+                return
+            try:
+                # One short append per entry, so concurrent writers never interleave lines
+                with open(self.path, "ab") as f:
+                    f.write(json.dumps({"key": cache_key}).encode("utf-8") + b"\n")
+            except OSError as e:
+                print(f"Error writing domain index: {str(e)}", file=sys.stderr)
+
+    def size(self):
+        with self.lock:
+            return sum(len(scope.keys) for scope in self.scopes.values())
+
+    def match(self, cache_key):
+        """
+        Returns (similar cache key, similarity) for the most similar other
+        domain with the same prefix, or None if none reaches the threshold.
+        """
+        prefix, _, key = cache_key.rpartition("|")
+        with self.lock:
+            self._refresh()
+            scope = self.scopes.get(prefix)
+            if scope is None or not scope.keys:
+                return None
+            if numpy is not None:
+                scores = scope.matrix[:len(scope.keys)] @ _hashed_vector(key)
+                best = int(numpy.argmax(scores))
+                score = float(scores[best])
+            else:
+                query = _sparse_vector(key)
+                best, score = -1, 0.0
+                for position, vector in enumerate(scope.vectors):
+                    similarity = sum(weight * vector.get(gram, 0.0) for gram, weight in query.items())
+                    if similarity > score:
+                        best, score = position, similarity
+            if best < 0 or score < self.threshold or scope.keys[best] == key:
+                return None
+            return f"{prefix}|{scope.keys[best]}", score
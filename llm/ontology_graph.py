@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Graph algorithms over ontology relationships, and a compact in-memory
+ontology representation.
+
+canonicalize() folds entity aliases ("Student", "students", "Students ")
+into one name and drops repeated relationships with a hash index on their
+normalized (from, relationship, to) triples, before connectivity repair and
+enrichment see them.
+
+Connectivity uses a union-find over integer entity ids, so finding the
+components of E relationships costs O(E α(V)) and the result does not depend
+on set or dict iteration order.
+
+Ontology stores entity and relationship names once (interned, with integer
+ids), edges as parallel typed arrays, and cardinalities and categories as
+small integer codes. The JSON shape used everywhere else (a dict with a list
+of relationship dicts) is only produced by Ontology.to_dict().
+"""
+import functools
+import sys
+import unicodedata
+from array import array
+from collections import Counter
+
+import ontology_domains
+import ontology_schema
+
+# Decoding tables for the integer codes; the code of a value is its index
+CARDINALITIES = tuple(ontology_schema.CARDINALITIES)
+CATEGORIES = tuple(ontology_schema.CATEGORIES)
+DEFAULT_CARDINALITY = "1"
+DEFAULT_CATEGORY = "associates-with"
+
+_CARDINALITY_CODES = {value: code for code, value in enumerate(CARDINALITIES)}
+_CATEGORY_CODES = {value: code for code, value in enumerate(CATEGORIES)}
+
+
+def _code(codes, value, default):
+    """The code of a value, or of the default if the value is unknown or not even a string."""
+    return codes.get(value, codes[default]) if isinstance(value, str) else codes[default]
+
+
+class UnionFind:
+    """Disjoint sets over the integers 0..n-1 with union by rank and path halving."""
+
+    __slots__ = ("parent", "rank")
+
+    def __init__(self):
+        self.parent = []
+        self.rank = []
+
+    def add(self):
+        """Adds a new singleton set and returns its id."""
+        self.parent.append(len(self.parent))
+        self.rank.append(0)
+        return len(self.parent) - 1
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        a = self.find(a)
+        b = self.find(b)
+        if a == b:
+            return False
+        if self.rank[a] < self.rank[b]:
+            a, b = b, a
+        self.parent[b] = a
+        if self.rank[a] == self.rank[b]:
+            self.rank[a] += 1
+        return True
+
+
+# Characters that are part of a name ("C++", "C#", "R&D") rather than separators
+_NAME_SYMBOLS = frozenset("#%&*@")
+
+
+@functools.lru_cache(maxsize=8192)
+def name_key(name):
+    """
+    Identity of an entity name or relationship label: compatibility forms,
+    case, spacing, separating punctuation and regular plurals are ignored,
+    while letters of every script, digits and symbols are kept, so "C++",
+    "C#" and "C" stay three entities.
+    """
+    chars = []
+    for char in unicodedata.normalize("NFKC", str(name)).casefold():
+        category = unicodedata.category(char)
+        if category[0] in "LMNS" or char in _NAME_SYMBOLS:
+            chars.append(char)
+        else:
+            chars.append(" ")
+    return " ".join(ontology_domains.singular(word) for word in "".join(chars).split())
+
+
+def relationship_key(rel):
+    """Identity of a relationship for de-duplication: the name_key of its source, label and target."""
+    return tuple(name_key(str(rel.get(field, ""))) for field in ("from", "relationship", "to"))
+
+
+def new_relationships(existing, candidates):
+    """Returns the candidates whose relationship_key is not in `existing` (nor repeated among themselves)."""
+    seen = {relationship_key(rel) for rel in existing}
+    added = []
+    for rel in candidates:
+        if not isinstance(rel, dict):
+            continue
+        key = relationship_key(rel)
+        if key not in seen:
+            seen.add(key)
+            added.append(rel)
+    return added
+
+
+def canonicalize(relationships, existing=()):
+    """
+    Folds entity aliases and removes repeated relationships.
+
+    Entity names with the same name_key are renamed to one spelling: the one
+    used by the `existing` relationships if they mention the entity, else
+    the most frequent one (the first seen on ties). Relationships are then
+    indexed by relationship_key and only the first of each is kept, taking
+    the details of a repeat if it has none. A relationship that renaming
+    turns into a loop ("User" manages "Users") is kept as the loop on the
+    canonical entity; malformed ones are dropped. Renamed relationships are
+    copies; the input is not changed.
+
+    Returns (relationships, number renamed, number removed).
+    """
+    names = {}
+    for rel in existing:
+        if isinstance(rel, dict):
+            for field in ("from", "to"):
+                name = " ".join(str(rel.get(field, "")).split())
+                names.setdefault(name_key(name), name)
+
+    spellings = {}
+    valid = []
+    for rel in relationships:
+        if not isinstance(rel, dict) or "from" not in rel or "to" not in rel or "relationship" not in rel:
+            continue
+        valid.append(rel)
+        for field in ("from", "to"):
+            name = " ".join(str(rel[field]).split())
+            spellings.setdefault(name_key(name), Counter())[name] += 1
+    for key, counts in spellings.items():
+        if key not in names:
+            names[key] = counts.most_common(1)[0][0]
+
+    index = {}      # relationship_key -> position in kept
+    kept = []
+    renamed = 0
+    removed = 0
+    for rel in valid:
+        source = names[name_key(" ".join(str(rel["from"]).split()))]
+        target = names[name_key(" ".join(str(rel["to"]).split()))]
+        if source != rel["from"] or target != rel["to"]:
+            rel = dict(rel, **{"from": source, "to": target})
+            renamed += 1
+        key = relationship_key(rel)
+        position = index.get(key)
+        if position is None:
+            index[key] = len(kept)
+            kept.append(rel)
+        else:
+            removed += 1
+            if "details" not in kept[position] and "details" in rel:
+                kept[position] = dict(kept[position], details=rel["details"])
+    return kept, renamed, removed
+
+
+def connected_components(relationships):
+    """
+    Groups the entities of a list of relationships into weakly connected
+    components (direction is ignored).
+
+    Returns a list of components, largest first (ties broken by which
+    component's first entity appeared first). Each component is a list of
+    entity names in order of first appearance, except that its hub, the entity
+    with the most relationships, is moved to the front.
+    """
+    ids = {}
+    names = []
+    degree = []
+    sets = UnionFind()
+
+    for rel in relationships:
+        source = rel.get("from", "")
+        target = rel.get("to", "")
+        if not source or not target:
+            continue
+        endpoints = []
+        for name in (source, target):
+            entity = ids.get(name)
+            if entity is None:
+                entity = sets.add()
+                ids[name] = entity
+                names.append(name)
+                degree.append(0)
+            degree[entity] += 1
+            endpoints.append(entity)
+        sets.union(endpoints[0], endpoints[1])
+
+    groups = {}
+    for entity in range(len(names)):
+        groups.setdefault(sets.find(entity), []).append(entity)
+
+    components = []
+    for members in sorted(groups.values(), key=lambda m: (-len(m), m[0])):
+        hub = min(members, key=lambda e: (-degree[e], e))
+        components.append([names[hub]] + [names[e] for e in members if e != hub])
+    return components
+
+
+def bridging_relationships(components):
+    """
+    Builds the relationships that join a list of components (as returned by
+    connected_components) into one: the hub of every smaller component is
+    linked from the hub of the largest component.
+    """
+    if len(components) < 2:
+        return []
+    main_hub = components[0][0]
+    return [{
+        "from": main_hub,
+        "to": component[0],
+        "relationship": "relates to",
+        "fromCardinality": "0..1",
+        "toCardinality": "0..1",
+        "category": "associates-with"
+    } for component in components[1:]]
+
+
+class Ontology:
+    """
+    Compact ontology graph.
+
+    Entities and relationship labels are interned and numbered; edge i is
+    described by sources[i], targets[i], labels[i] (ids) and the codes in
+    from_cardinalities[i], to_cardinalities[i] and categories[i]. Optional
+    per-edge details are kept in a parallel list, and any other top-level keys
+    of the source dict (such as "error") in `extra`.
+    """
+
+    __slots__ = ("domain", "entities", "entity_ids", "label_names", "label_ids",
+                 "sources", "targets", "labels", "from_cardinalities", "to_cardinalities",
+                 "categories", "details", "extra")
+
+    def __init__(self, domain=""):
+        self.domain = domain
+        self.entities = []          # id -> name
+        self.entity_ids = {}        # name -> id
+        self.label_names = []
+        self.label_ids = {}
+        self.sources = array("i")
+        self.targets = array("i")
+        self.labels = array("i")
+        self.from_cardinalities = array("b")
+        self.to_cardinalities = array("b")
+        self.categories = array("b")
+        self.details = []           # edge -> details dict or None
+        self.extra = {}
+
+    def __len__(self):
+        return len(self.sources)
+
+    def entity_id(self, name):
+        """Returns the id for an entity name, adding the entity if it is new."""
+        entity = self.entity_ids.get(name)
+        if entity is None:
+            entity = len(self.entities)
+            name = sys.intern(name)
+            self.entities.append(name)
+            self.entity_ids[name] = entity
+        return entity
+
+    def _label_id(self, label):
+        label_id = self.label_ids.get(label)
+        if label_id is None:
+            label_id = len(self.label_names)
+            label = sys.intern(label)
+            self.label_names.append(label)
+            self.label_ids[label] = label_id
+        return label_id
+
+    def add(self, source, target, relationship, from_cardinality=DEFAULT_CARDINALITY,
+            to_cardinality=DEFAULT_CARDINALITY, category=DEFAULT_CATEGORY, details=None):
+        """
+        Adds an edge and returns its index. Unknown or malformed (non-string)
+        cardinalities and categories are replaced by the defaults, as
+        validate_relationship does.
+        """
+        self.sources.append(self.entity_id(source))
+        self.targets.append(self.entity_id(target))
+        self.labels.append(self._label_id(relationship))
+        self.from_cardinalities.append(_code(_CARDINALITY_CODES, from_cardinality, DEFAULT_CARDINALITY))
+        self.to_cardinalities.append(_code(_CARDINALITY_CODES, to_cardinality, DEFAULT_CARDINALITY))
+        self.categories.append(_code(_CATEGORY_CODES, category, DEFAULT_CATEGORY))
+        self.details.append(details)
+        return len(self.sources) - 1
+
+    def append(self, rel):
+        """Adds a relationship dict; returns its edge index, or None if it lacks from/to/relationship."""
+        if not isinstance(rel, dict) or "from" not in rel or "to" not in rel or "relationship" not in rel:
+            return None
+        return self.add(
+            str(rel["from"]),
+            str(rel["to"]),
+            str(rel["relationship"]),
+            rel.get("fromCardinality", DEFAULT_CARDINALITY),
+            rel.get("toCardinality", DEFAULT_CARDINALITY),
+            rel.get("category", DEFAULT_CATEGORY),
+            rel.get("details")
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds an Ontology from the JSON shape, dropping malformed relationships."""
+        ontology = cls(data.get("domain", "") if isinstance(data.get("domain"), str) else "")
+        relationships = data.get("relationships")
+        if isinstance(relationships, list):
+            for rel in relationships:
+                ontology.append(rel)
+        ontology.extra = {key: value for key, value in data.items() if key not in ("domain", "relationships")}
+        return ontology
+
+    def merge(self, relationships):
+        """
+        Appends the relationship dicts that are not already edges of this
+        ontology (compared with relationship_key) and returns the indices of
+        the edges added.
+        """
+        added = []
+        for rel in new_relationships((self.relationship(i) for i in range(len(self))), relationships):
+            edge = self.append(rel)
+            if edge is not None:
+                added.append(edge)
+        return added
+
+    def relationship(self, edge):
+        """Returns edge `edge` as a relationship dict."""
+        rel = {
+            "from": self.entities[self.sources[edge]],
+            "to": self.entities[self.targets[edge]],
+            "relationship": self.label_names[self.labels[edge]],
+            "fromCardinality": CARDINALITIES[self.from_cardinalities[edge]],
+            "toCardinality": CARDINALITIES[self.to_cardinalities[edge]],
+            "category": CATEGORIES[self.categories[edge]]
+        }
+        if self.details[edge] is not None:
+            rel["details"] = self.details[edge]
+        return rel
+
+    def to_dict(self):
+        """Converts back to the JSON shape ({"domain", "relationships", ...})."""
+        data = {"domain": self.domain, "relationships": [self.relationship(i) for i in range(len(self))]}
+        data.update(self.extra)
+        return data
+
+    def degrees(self):
+        """Returns an array with the number of edges touching each entity."""
+        degree = array("i", bytes(4 * len(self.entities)))
+        for entity in self.sources:
+            degree[entity] += 1
+        for entity in self.targets:
+            degree[entity] += 1
+        return degree
+
+    def components(self):
+        """Same result as connected_components(), computed directly on the id arrays."""
+        sets = UnionFind()
+        for _ in self.entities:
+            sets.add()
+        for source, target in zip(self.sources, self.targets):
+            sets.union(source, target)
+
+        # Entities that only appear in removed edges are not part of the graph
+        present = bytearray(len(self.entities))
+        for entity in self.sources:
+            present[entity] = 1
+        for entity in self.targets:
+            present[entity] = 1
+
+        degree = self.degrees()
+        groups = {}
+        for entity in range(len(self.entities)):
+            if present[entity]:
+                groups.setdefault(sets.find(entity), []).append(entity)
+
+        components = []
+        for members in sorted(groups.values(), key=lambda m: (-len(m), m[0])):
+            hub = min(members, key=lambda e: (-degree[e], e))
+            components.append([self.entities[hub]] + [self.entities[e] for e in members if e != hub])
+        return components
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Hierarchical generation of large ontologies.
+
+One prompt asking for hundreds of relationships neither fits a context
+window nor finishes within the request timeout, so large ontologies are
+built in two levels: one call names the domain's top-level concepts and
+how they relate to each other, then one call per concept generates the
+relationships around it, several at a time. Each of those prompts lists the
+other concepts so entities shared between clusters keep the same name. The
+clusters are merged without duplicates and joined into one connected graph.
+
+The Ollama calls stay in the clients; this module holds the prompts,
+planning and merging they share.
+"""
+import math
+import sys
+
+import ontology_graph
+
+# Relationships one generation call is asked for; what a single prompt answers reliably
+CLUSTER_SIZE = 15
+# Clusters overlap, so each asks for this much more than its share of the target
+OVERLAP = 1.25
+MAX_CONCEPTS = 40
+
+
+def is_hierarchical(target):
+    """True if a relationship target is too large for a single generation call."""
+    return bool(target) and target > CLUSTER_SIZE
+
+
+def concept_count(target):
+    """Number of top-level concepts (one cluster each) to ask for."""
+    return max(2, min(MAX_CONCEPTS, math.ceil(target / CLUSTER_SIZE)))
+
+
+def cluster_size(target, concepts):
+    """Relationships to ask for per concept so the merged ontology reaches about `target`."""
+    return max(5, math.ceil(target * OVERLAP / max(1, concepts)))
+
+
+def build_concepts_prompt(domain, count):
+    """User prompt asking for the top-level concepts of a domain and the relationships between them."""
+    return f"""
+        Identify the {count} most important top-level concepts of the domain of "{domain}": the main kinds of entities a comprehensive ontology of this domain is organized around.
+
+        Return a JSON structure with:
+        1. A "domain" field with the domain name as string
+        2. A "concepts" array with the {count} concept names as strings (short singular nouns such as "Student" or "Course")
+        3. A "relationships" array linking the concepts to each other, each with "from", "to", and "relationship" fields, so that every concept is connected
+
+        Return ONLY valid JSON.
+        """
+
+
+def build_cluster_instructions(domain, concept, concepts):
+    """Paragraph appended to a generation prompt to confine it to one concept's part of the ontology."""
+    others = ", ".join(f'"{name}"' for name in concepts if name != concept)
+    return f"""
+        This request covers one part of a larger ontology of "{domain}": the part around the concept "{concept}".
+        Every relationship must involve "{concept}" or an entity closely related to it, and together they must form one connected graph that includes "{concept}".
+        Other parts of the ontology cover these top-level concepts: {others}. Use exactly these names when a relationship involves one of them, but do not describe them further.
+        """
+
+
+def _is_relationship(rel):
+    return isinstance(rel, dict) and "from" in rel and "to" in rel and "relationship" in rel
+
+
+def parse_concepts(parsed, count):
+    """
+    Reads the reply to the concepts prompt and returns (concept names,
+    relationships between them). Names may be strings or objects with a
+    "name"; repeated names and any beyond `count` are dropped.
+    """
+    if not isinstance(parsed, dict):
+        return [], []
+
+    concepts = []
+    seen = set()
+    for item in parsed.get("concepts") or []:
+        name = item.get("name") if isinstance(item, dict) else item
+        if not isinstance(name, str) or not name.strip():
+            continue
+        name = " ".join(name.split())
+        if name.lower() not in seen:
+            seen.add(name.lower())
+            concepts.append(name)
+
+    relationships = parsed.get("relationships")
+    relationships = [rel for rel in relationships if _is_relationship(rel)] if isinstance(relationships, list) else []
+    return concepts[:count], relationships
+
+
+def merge_clusters(domain, clusters, placeholders=()):
+    """
+    Merges lists of relationships (the relationships between the concepts
+    first, then one list per concept) into one ontology. Entity aliases are
+    folded and malformed relationships, repeats (ontology_graph.canonicalize)
+    and the client's `placeholders` (its fallback relationships, returned
+    when a reply could not be parsed) are dropped; disconnected parts are
+    then joined as the clients' connectivity repair does.
+    """
+    # entity aliases are folded first, so "Student" in one cluster and
+    # "Students" in another do not become separate parts of the graph
+    placeholder_keys = {ontology_graph.relationship_key(rel) for rel in placeholders}
+    relationships, _, _ = ontology_graph.canonicalize([rel for cluster in clusters for rel in cluster])
+    relationships = [rel for rel in relationships if ontology_graph.relationship_key(rel) not in placeholder_keys]
+
+    print(f"Merged {len(clusters)} clusters into {len(relationships)} distinct relationships", file=sys.stderr)
+    components = ontology_graph.connected_components(relationships)
+    if len(components) > 1:
+        print(f"Joining {len(components)} disconnected parts of the merged ontology", file=sys.stderr)
+        relationships.extend(ontology_graph.bridging_relationships(components))
+
+    return {"domain": domain, "relationships": relationships}
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+HTTP plumbing shared by both generator variants: a pooled keep-alive
+session with retries, a health check whose result is cached briefly so it
+does not cost an extra round trip on every LLM call, and a pool that spreads
+calls over several Ollama endpoints.
+"""
+import contextlib
+import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+DEFAULT_HEALTH_TTL = 30
+# How long an endpoint that failed a call is skipped before it is tried again
+DEFAULT_FAILURE_COOLDOWN = 10
+# Weight of the newest sample in an endpoint's moving average latency
+LATENCY_SMOOTHING = 0.2
+# How long Ollama keeps the model loaded after a call in long-running modes
+# (--serve, --batch); one-shot runs leave Ollama's own default of 5 minutes
+LONG_RUNNING_KEEP_ALIVE = "30m"
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """
+    Builds a requests.Session that keeps up to pool_size connections alive.
+    Connection failures and 502/503/504 responses are retried with
+    exponential backoff; read timeouts are not, since a generation that
+    timed out once will usually time out again.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET", "POST"]),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class HealthCheck:
+    """
+    Probes {base_url}/api/tags and remembers the outcome for `ttl` seconds.
+    Failures are remembered for a shorter time so recovery is noticed quickly.
+    """
+
+    def __init__(self, session, base_url, ttl=DEFAULT_HEALTH_TTL, timeout=5, failure_ttl=2):
+        self.session = session
+        self.url = f"{base_url}/api/tags"
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.timeout = timeout
+        self.checked_at = None
+        self.error = None
+        self.lock = threading.Lock()
+
+    def ensure(self):
+        """Raises the (possibly cached) RequestException if Ollama is unreachable."""
+        with self.lock:
+            now = time.monotonic()
+            if self.checked_at is not None:
+                ttl = self.failure_ttl if self.error is not None else self.ttl
+                if now - self.checked_at < ttl:
+                    if self.error is not None:
+                        raise self.error
+                    return
+
+            try:
+                response = self.session.get(self.url, timeout=self.timeout)
+                response.raise_for_status()
+                self.error = None
+            except requests.exceptions.RequestException as e:
+                self.error = e
+            self.checked_at = time.monotonic()
+
+            if self.error is not None:
+                raise self.error
+
+    def invalidate(self):
+        """Forces the next ensure() to probe again, e.g. after a failed LLM call."""
+        with self.lock:
+            self.checked_at = None
+
+
+def parse_base_urls(base_url):
+    """Accepts one URL, a comma-separated string of URLs or a list; returns a list without trailing slashes."""
+    if isinstance(base_url, str):
+        base_url = base_url.split(",")
+    urls = [url.strip().rstrip("/") for url in base_url if url and url.strip()]
+    if not urls:
+        raise ValueError("At least one Ollama URL is required")
+    return urls
+
+
+class Endpoint:
+    """One Ollama server in an EndpointPool, with its health check and call statistics."""
+
+    def __init__(self, session, base_url, health_ttl):
+        self.base_url = base_url
+        self.health = HealthCheck(session, base_url, ttl=health_ttl)
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.seconds = 0.0
+        self.latency = None         # moving average seconds per call
+        self.down_until = 0.0
+
+    def stats(self):
+        return {
+            "url": self.base_url,
+            "healthy": self.down_until <= time.monotonic(),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "seconds": round(self.seconds, 6),
+            "avg_latency_seconds": None if self.latency is None else round(self.latency, 6)
+        }
+
+
+class EndpointPool:
+    """
+    Spreads Ollama calls over one or more endpoints. Each call goes to the
+    available endpoint with the fewest outstanding requests, ties broken by
+    lower average latency and then by list order. An endpoint that fails to
+    connect (or answers 502/503/504 after retries) is skipped for
+    `failure_cooldown` seconds and the call moves on to the next endpoint.
+    """
+
+    def __init__(self, session, base_url, health_ttl=DEFAULT_HEALTH_TTL, failure_cooldown=DEFAULT_FAILURE_COOLDOWN):
+        self.session = session
+        self.endpoints = [Endpoint(session, url, health_ttl) for url in parse_base_urls(base_url)]
+        self.failure_cooldown = failure_cooldown
+        self.lock = threading.Lock()
+
+    @property
+    def urls(self):
+        return [endpoint.base_url for endpoint in self.endpoints]
+
+    def ensure(self):
+        """Raises the last RequestException if no endpoint passes its (cached) health check."""
+        error = None
+        for endpoint in self._ranked():
+            try:
+                endpoint.health.ensure()
+            except requests.exceptions.RequestException as e:
+                with self.lock:
+                    endpoint.down_until = time.monotonic() + self.failure_cooldown
+                error = e
+                continue
+            with self.lock:
+                endpoint.down_until = 0.0
+            return
+        raise error
+
+    def invalidate(self):
+        """Forces every endpoint's health check to probe again."""
+        for endpoint in self.endpoints:
+            endpoint.health.invalidate()
+
+    def _ranked(self, exclude=()):
+        """Endpoints in the order calls should try them; ones in cooldown come last."""
+        with self.lock:
+            return self._rank(exclude)
+
+    def _rank(self, exclude):
+        # callers hold self.lock
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e not in exclude]
+        return sorted(candidates, key=lambda e: (
+            e.down_until > now,
+            e.outstanding,
+            e.latency if e.latency is not None else 0.0,
+            self.endpoints.index(e)
+        ))
+
+    @contextlib.contextmanager
+    def acquire(self, exclude=()):
+        """
+        Picks the endpoint the next call should use and counts the enclosed
+        call as outstanding on it, in one step under the pool's lock, so
+        concurrent callers see each other's choice. Yields the endpoint, or
+        None (counting nothing) if all are excluded.
+        """
+        with self.lock:
+            ranked = self._rank(exclude)
+            endpoint = ranked[0] if ranked else None
+            if endpoint is not None:
+                self._start(endpoint)
+        if endpoint is None:
+            yield None
+            return
+        started = time.monotonic()
+        try:
+            yield endpoint
+        finally:
+            self._finish(endpoint, time.monotonic() - started)
+
+    def mark_failed(self, endpoint):
+        with self.lock:
+            endpoint.failures += 1
+            endpoint.down_until = time.monotonic() + self.failure_cooldown
+        endpoint.health.invalidate()
+
+    @contextlib.contextmanager
+    def track(self, endpoint):
+        """Counts the enclosed call as outstanding on a given `endpoint` and records its latency."""
+        with self.lock:
+            self._start(endpoint)
+        started = time.monotonic()
+        try:
+            yield endpoint
+        finally:
+            self._finish(endpoint, time.monotonic() - started)
+
+    def _start(self, endpoint):
+        # callers hold self.lock
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+
+    def _finish(self, endpoint, seconds):
+        with self.lock:
+            endpoint.outstanding -= 1
+            endpoint.seconds += seconds
+            if endpoint.latency is None:
+                endpoint.latency = seconds
+            else:
+                endpoint.latency += LATENCY_SMOOTHING * (seconds - endpoint.latency)
+
+    def post(self, path, **kwargs):
+        """
+        POSTs to `path` on the best endpoint, failing over to the others on
+        connection errors and 502/503/504. Returns the requests.Response.
+        Streamed responses should use stream() instead, so the endpoint
+        counts as busy until they are consumed.
+        """
+        tried = []
+        while True:
+            with self.acquire(tried) as endpoint:
+                tried.append(endpoint)
+                response = self._send(endpoint, path, len(tried) == len(self.endpoints), kwargs)
+            if response is not None:
+                return response
+
+    @contextlib.contextmanager
+    def stream(self, path, **kwargs):
+        """
+        Like post() with stream=True, as a context manager yielding the
+        response: the endpoint counts as busy until the block ends, so long
+        streaming generations are not mistaken for idle endpoints. The
+        response is closed on exit.
+        """
+        tried = []
+        while True:
+            with self.acquire(tried) as endpoint:
+                tried.append(endpoint)
+                response = self._send(endpoint, path, len(tried) == len(self.endpoints), dict(kwargs, stream=True))
+                if response is not None:
+                    with response:
+                        yield response
+                    return
+
+    def _send(self, endpoint, path, last, kwargs):
+        """One attempt of post(); returns None if the next endpoint should be tried."""
+        try:
+            response = self.session.post(f"{endpoint.base_url}{path}", **kwargs)
+        except requests.exceptions.ConnectionError:
+            self.mark_failed(endpoint)
+            if last:
+                raise
+            print(f"Ollama at {endpoint.base_url} is unreachable, trying the next endpoint", file=sys.stderr)
+            return None
+        if response.status_code in (502, 503, 504) and not last:
+            self.mark_failed(endpoint)
+            response.close()
+            print(f"Ollama at {endpoint.base_url} answered {response.status_code}, trying the next endpoint", file=sys.stderr)
+            return None
+        return response
+
+    def post_each(self, path, **kwargs):
+        """
+        POSTs the same request to every endpoint in turn, e.g. to load the
+        model on each. Returns (endpoint URL, response or RequestException) pairs.
+        """
+        results = []
+        for endpoint in self.endpoints:
+            with self.track(endpoint):
+                try:
+                    results.append((endpoint.base_url, self.session.post(f"{endpoint.base_url}{path}", **kwargs)))
+                except requests.exceptions.RequestException as e:
+                    self.mark_failed(endpoint)
+                    results.append((endpoint.base_url, e))
+        return results
+
+    def outstanding(self):
+        """Number of calls in flight across all endpoints."""
+        with self.lock:
+            return sum(endpoint.outstanding for endpoint in self.endpoints)
+
+    def stats(self):
+        with self.lock:
+            return [endpoint.stats() for endpoint in self.endpoints]
+
+    def to_prometheus(self):
+        """Per-endpoint counters in the Prometheus text format."""
+        stats = self.stats()
+        metrics = [
+            ("ontology_endpoint_requests_total", "counter", "requests"),
+            ("ontology_endpoint_failures_total", "counter", "failures"),
+            ("ontology_endpoint_seconds_total", "counter", "seconds"),
+            ("ontology_endpoint_outstanding", "gauge", "outstanding"),
+            ("ontology_endpoint_healthy", "gauge", "healthy")
+        ]
+        lines = []
+        for name, kind, field in metrics:
+            lines.append(f"# TYPE {name} {kind}")
+            for entry in stats:
+                lines.append(f'{name}{{endpoint="{entry["url"]}"}} {int(entry[field]) if field == "healthy" else entry[field]}')
+        return "\n".join(lines) + "\n"
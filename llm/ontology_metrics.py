@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing and Ollama token metrics.
+
+Stages are timed with Metrics.span(); the timings Ollama reports with each
+reply (prompt_eval_count/duration, eval_count/duration, ...) are recorded
+with Metrics.record_ollama(). Everything is aggregated in memory for the
+Prometheus text endpoint, and optionally written as one JSON object per
+line so a single slow request can be broken down after the fact.
+"""
+import contextlib
+import contextvars
+import json
+import threading
+import time
+import uuid
+
+# Fields Ollama returns on a finished generation; *_duration values are nanoseconds
+OLLAMA_FIELDS = ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration",
+                 "load_duration", "total_duration")
+
+_current_trace = contextvars.ContextVar("ontology_trace", default=None)
+
+
+def current_trace():
+    """Returns the trace (trace_id and domain) active in this context, if any."""
+    return _current_trace.get()
+
+
+class Metrics:
+
+    def __init__(self, log_stream=None):
+        self.log_stream = log_stream    # file object for JSON log lines, or None
+        self.lock = threading.Lock()
+        self.stages = {}                # stage -> {"count", "seconds", "max_seconds", "errors"}
+        self.ollama = {}                # stage -> {"calls", field: total}
+
+    @contextlib.contextmanager
+    def trace(self, domain):
+        """Tags every span and Ollama record inside the block with one trace id."""
+        token = _current_trace.set({"trace_id": uuid.uuid4().hex[:12], "domain": domain})
+        try:
+            yield
+        finally:
+            _current_trace.reset(token)
+
+    @contextlib.contextmanager
+    def span(self, name, **fields):
+        """Times the enclosed block as stage `name`; extra fields only go to the JSON log."""
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            with self.lock:
+                stats = self.stages.setdefault(name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "errors": 0})
+                stats["count"] += 1
+                stats["seconds"] += seconds
+                stats["max_seconds"] = max(stats["max_seconds"], seconds)
+                if error is not None:
+                    stats["errors"] += 1
+            record = {"span": name, "seconds": round(seconds, 6)}
+            record.update(fields)
+            if error is not None:
+                record["error"] = error
+            self._log(record)
+
+    def record_ollama(self, stage, reply):
+        """Accumulates the timing fields from an Ollama reply (or final stream chunk)."""
+        if not isinstance(reply, dict):
+            return
+        values = {field: reply[field] for field in OLLAMA_FIELDS if isinstance(reply.get(field), (int, float))}
+        if not values:
+            return
+        with self.lock:
+            totals = self.ollama.setdefault(stage, {"calls": 0})
+            totals["calls"] += 1
+            for field, value in values.items():
+                totals[field] = totals.get(field, 0) + value
+
+        record = {"ollama": stage}
+        for field, value in values.items():
+            if field.endswith("_duration"):
+                record[field.replace("_duration", "_seconds")] = round(value / 1e9, 6)
+            else:
+                record[field] = value
+        if values.get("eval_duration") and values.get("eval_count"):
+            record["tokens_per_second"] = round(values["eval_count"] / (values["eval_duration"] / 1e9), 2)
+        if values.get("prompt_eval_duration") and values.get("prompt_eval_count"):
+            record["prompt_tokens_per_second"] = round(values["prompt_eval_count"] / (values["prompt_eval_duration"] / 1e9), 2)
+        self._log(record)
+
+    def _log(self, record):
+        if self.log_stream is None:
+            return
+        entry = {"time": round(time.time(), 3)}
+        trace = _current_trace.get()
+        if trace is not None:
+            entry.update(trace)
+        entry.update(record)
+        line = json.dumps(entry)
+        with self.lock:
+            self.log_stream.write(line + "\n")
+            self.log_stream.flush()
+
+    def snapshot(self):
+        """Returns a copy of the aggregated stage and Ollama metrics."""
+        with self.lock:
+            return {
+                "stages": {name: dict(stats) for name, stats in self.stages.items()},
+                "ollama": {name: dict(totals) for name, totals in self.ollama.items()}
+            }
+
+    def to_prometheus(self, extra=None):
+        """
+        Renders the aggregated metrics in the Prometheus text exposition format.
+        `extra` maps additional metric names to values (e.g. cache counters).
+        """
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP ontology_stage_seconds Time spent in each pipeline stage.",
+            "# TYPE ontology_stage_seconds summary"
+        ]
+        for stage, stats in sorted(snapshot["stages"].items()):
+            lines.append(f'ontology_stage_seconds_sum{{stage="{stage}"}} {stats["seconds"]:.6f}')
+            lines.append(f'ontology_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        lines.append("# TYPE ontology_stage_seconds_max gauge")
+        for stage, stats in sorted(snapshot["stages"].items()):
+            lines.append(f'ontology_stage_seconds_max{{stage="{stage}"}} {stats["max_seconds"]:.6f}')
+        lines.append("# TYPE ontology_stage_errors_total counter")
+        for stage, stats in sorted(snapshot["stages"].items()):
+            lines.append(f'ontology_stage_errors_total{{stage="{stage}"}} {stats["errors"]}')
+
+        ollama_metrics = [
+            ("calls", "ontology_ollama_calls_total", 1),
+            ("prompt_eval_count", "ontology_ollama_prompt_eval_tokens_total", 1),
+            ("prompt_eval_duration", "ontology_ollama_prompt_eval_seconds_total", 1e9),
+            ("eval_count", "ontology_ollama_eval_tokens_total", 1),
+            ("eval_duration", "ontology_ollama_eval_seconds_total", 1e9),
+            ("load_duration", "ontology_ollama_load_seconds_total", 1e9),
+            ("total_duration", "ontology_ollama_total_seconds_total", 1e9)
+        ]
+        for field, name, scale in ollama_metrics:
+            lines.append(f"# TYPE {name} counter")
+            for stage, totals in sorted(snapshot["ollama"].items()):
+                if field not in totals:
+                    continue
+                value = totals[field] if scale == 1 else f"{totals[field] / scale:.6f}"
+                lines.append(f'{name}{{stage="{stage}"}} {value}')
+
+        # Prompt evaluation per call; it drops when Ollama reuses a cached prompt prefix
+        lines.append("# TYPE ontology_ollama_prompt_eval_seconds_per_call gauge")
+        for stage, totals in sorted(snapshot["ollama"].items()):
+            if "prompt_eval_duration" in totals:
+                lines.append(f'ontology_ollama_prompt_eval_seconds_per_call{{stage="{stage}"}} {totals["prompt_eval_duration"] / 1e9 / totals["calls"]:.6f}')
+        lines.append("# TYPE ontology_ollama_prompt_eval_tokens_per_second gauge")
+        for stage, totals in sorted(snapshot["ollama"].items()):
+            if totals.get("prompt_eval_duration") and totals.get("prompt_eval_count"):
+                lines.append(f'ontology_ollama_prompt_eval_tokens_per_second{{stage="{stage}"}} {totals["prompt_eval_count"] / (totals["prompt_eval_duration"] / 1e9):.2f}')
+
+        for name, value in sorted((extra or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,1452 @@
+#!/usr/bin/env python3
+"""
+The ontology generation pipeline shared by every generator script.
+
+A request goes through these stages, in order:
+
+- cache: answer from OntologyCache when possible, and store the result
+- generate: ask Ollama for the relationships, in one call or concept by
+  concept for large targets (see ontology_hierarchy)
+- parse: extract the JSON from the reply, with placeholder relationships
+  when nothing usable comes back
+- validate: normalize the relationships and fold entity aliases and repeats
+- connect: join disconnected parts of the graph into one
+- enrich: add definitions, explanations and examples to every relationship
+
+Every stage is timed as its own metrics span, and all but generate and parse
+can be left out per client (stages=...) or on the command line (--stages).
+What differs between deployments (the model, its prompts and the stages run
+by default) is a Preset: ontology_generator.py and
+ontology_generator_windows.py are presets of this one OllamaClient and
+command line, so a change here applies to both.
+"""
+import requests
+import json
+import sys
+import re
+import traceback
+import os
+import copy
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import ontology_async
+import ontology_batch
+import ontology_cache
+import ontology_definitions
+import ontology_domains
+import ontology_graph
+import ontology_hierarchy
+import ontology_http
+import ontology_metrics
+import ontology_prefetch
+import ontology_schema
+import ontology_server
+import ontology_stream
+import ontology_tokens
+
+STAGES = ("cache", "generate", "parse", "validate", "connect", "enrich")
+# Stages that produce the ontology; every other one can be left out
+REQUIRED_STAGES = ("generate", "parse")
+# Stages that change the relationships themselves; ontologies generated with
+# a different choice than the preset's are cached separately
+SHAPE_STAGES = ("validate", "connect")
+
+ENRICHMENT_SYSTEM_PROMPT = "You are an expert ontology analyst who provides comprehensive definitions and detailed explanations of relationships between entities, focusing on depth and clarity."
+# Expected reply size, used to pack enrichment batches into the context window:
+# tokens per relationship's details, per requested entity definition, and per
+# reply (reasoning models such as deepseek-r1 think before answering)
+ENRICHMENT_TOKENS_PER_RELATIONSHIP = 300
+ENRICHMENT_TOKENS_PER_DEFINITION = 80
+ENRICHMENT_REPLY_OVERHEAD = 512
+
+
+def default_max_parallel():
+    """Enrichment and cluster generation concurrency to use when none is given: Ollama's OLLAMA_NUM_PARALLEL, else 1."""
+    try:
+        return max(1, int(os.environ.get("OLLAMA_NUM_PARALLEL", "1")))
+    except ValueError:
+        return 1
+
+
+def check_stages(stages):
+    """Returns `stages` as a frozenset; raises ValueError for unknown stages or a required one left out."""
+    stages = frozenset(stages)
+    unknown = sorted(stages.difference(STAGES))
+    if unknown:
+        raise ValueError(f"Unknown stage {', '.join(unknown)} (stages: {', '.join(STAGES)})")
+    missing = [stage for stage in REQUIRED_STAGES if stage not in stages]
+    if missing:
+        raise ValueError(f"The {' and '.join(missing)} stage cannot be skipped")
+    return stages
+
+
+def parse_stages(spec, defaults=STAGES):
+    """
+    Reads a --stages value: a comma-separated list of the stages to run, or
+    of changes to `defaults` ("+enrich,-cache"). Raises ValueError if it is
+    malformed or names an unknown stage.
+    """
+    items = [item.strip() for item in spec.split(",") if item.strip()]
+    changes = [item for item in items if item[0] in "+-"]
+    if changes and len(changes) != len(items):
+        raise ValueError("List either the stages to run or +stage/-stage changes, not both")
+    if not changes:
+        return check_stages(items)
+    stages = set(defaults)
+    for item in changes:
+        if item[0] == "+":
+            stages.add(item[1:].strip())
+        else:
+            stages.discard(item[1:].strip())
+    return check_stages(stages)
+
+
+class Preset:
+    """
+    What one deployment of the pipeline runs: the model, its prompts and the
+    stages enabled by default.
+    """
+
+    def __init__(self, name, model, prompt_version, system_prompt, ontology_prompt, expansion_prompt,
+                 typed=False, stages=STAGES, description=None):
+        self.name = name
+        self.model = model
+        # part of every cache key; bumped whenever the prompts change
+        self.prompt_version = prompt_version
+        self.system_prompt = system_prompt
+        self.ontology_prompt = ontology_prompt          # (domain, count) -> user prompt
+        self.expansion_prompt = expansion_prompt        # (domain, seed domain, existing relationship lines) -> user prompt
+        # relationships carry cardinalities and a category (ONTOLOGY_SCHEMA),
+        # not only from, to and relationship (SIMPLE_ONTOLOGY_SCHEMA)
+        self.typed = typed
+        self.schema = ontology_schema.ONTOLOGY_SCHEMA if typed else ontology_schema.SIMPLE_ONTOLOGY_SCHEMA
+        self.stages = check_stages(stages)
+        self.description = description or f"Generate domain ontologies using {model}"
+
+
+class OllamaClient:
+    """
+    Generates ontologies with Ollama through the stages of a Preset, given
+    to the constructor or set as the `preset` attribute of a subclass (as
+    the generator scripts do). `stages` overrides the preset's stages;
+    lazy_enrichment leaves out enrichment, whose details fetch_details()
+    then adds on demand.
+    """
+
+    preset = None
+
+    def __init__(self, base_url="http://localhost:11434", cache_dir=None, max_parallel=None, model=None,
+                 cache_ttl=None, cache_size=ontology_cache.DEFAULT_DISK_ENTRIES,
+                 pool_size=ontology_http.DEFAULT_POOL_SIZE, retries=ontology_http.DEFAULT_RETRIES,
+                 health_ttl=ontology_http.DEFAULT_HEALTH_TTL, structured_output=False, metrics=None,
+                 similarity=None, stale_while_revalidate=False, lazy_enrichment=False, relationship_target=None,
+                 cache_backend="files", keep_alive=None, preset=None, stages=None):
+        if preset is not None:
+            self.preset = preset
+        if self.preset is None:
+            raise ValueError("OllamaClient needs a preset")
+        self.base_url = base_url
+        self.model = model or self.preset.model
+        # JSON schema of the ontologies this client generates
+        self.schema = self.preset.schema
+        stages = set(self.preset.stages if stages is None else stages)
+        if lazy_enrichment:
+            stages.discard("enrich")
+        self.stages = check_stages(stages)
+        # ask Ollama to constrain replies to our JSON schemas ("format" parameter)
+        self.structured_output = structured_output
+        # how long Ollama keeps the model loaded after each call ("30m", "-1"
+        # for ever); None leaves Ollama's default
+        self.keep_alive = keep_alive
+        self.current_domain = ""
+        # maximum number of enrichment (and cluster generation) requests in flight
+        # at once; should not exceed the number of requests the Ollama server
+        # handles in parallel
+        self.max_parallel = max_parallel or default_max_parallel()
+        # one keep-alive connection pool for every call this client makes,
+        # large enough that parallel enrichment never waits for a connection
+        self.session = ontology_http.create_session(pool_size=max(pool_size, self.max_parallel), retries=retries)
+        # base_url may list several Ollama servers (a list or comma-separated);
+        # calls go to the least busy one and fail over between them
+        self.endpoints = ontology_http.EndpointPool(self.session, base_url, health_ttl=health_ttl)
+        # where to store cache files; default: a "cache" folder next to this script
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(__file__), "cache")
+        # with a similarity threshold (0-1), near-duplicate domain names share cached ontologies;
+        # cache_backend "sqlite" keeps the disk tier in one compressed database file
+        self.cache = ontology_cache.OntologyCache(self.cache_dir, ttl=cache_ttl, max_entries=cache_size, similarity=similarity,
+                                                  keep_stale=stale_while_revalidate, backend=cache_backend)
+        # serve expired (or older model/prompt) ontologies at once and regenerate them in the background
+        self.stale_while_revalidate = stale_while_revalidate
+        self.prefetcher = ontology_prefetch.Prefetcher(self)
+        # concurrent requests for the same cache key share one generation
+        self.single_flight = ontology_cache.SingleFlight(self.cache_dir)
+        # entity definitions reused across relationships and runs during enrichment,
+        # but not across models or prompt versions
+        self.definitions = ontology_definitions.DefinitionStore(
+            os.path.join(self.cache_dir, "definitions"), scope=f"{self.model}|{self.preset.prompt_version}"
+        )
+        # about how many relationships to generate; targets above
+        # ontology_hierarchy.CLUSTER_SIZE are generated concept by concept
+        self.relationship_target = relationship_target
+        # relationships per enrichment call; lowered when replies come back truncated
+        self.enrichment_batch_size = ontology_tokens.AdaptiveBatchSize()
+        # per-stage timings and Ollama token counts
+        self.metrics = metrics or ontology_metrics.Metrics()
+
+    def cache_key(self, domain, num_ctx):
+        """Cache key of the ontology for a domain with this client's model, prompts and stages"""
+        # stale entries of an older model or prompt version are only served within one variant
+        variant = self.preset.name
+        if ontology_hierarchy.is_hierarchical(self.relationship_target):
+            # ontologies generated for different sizes are cached separately
+            variant += f"-h{self.relationship_target}"
+        elif self.relationship_target:
+            variant += f"-r{self.relationship_target}"
+        for stage in SHAPE_STAGES:
+            # so are ontologies validated or connected unlike the preset's
+            if (stage in self.stages) != (stage in self.preset.stages):
+                variant += f"{'+' if stage in self.stages else '-'}{stage}"
+        return ontology_cache.make_cache_key(domain, self.model, self.preset.prompt_version, num_ctx, variant)
+
+    def _build_payload(self, system, prompt, options, schema, stream=False):
+        """Builds an /api/generate request body, requesting structured output when enabled"""
+        payload = {
+            "model": self.model,
+            "system": system,
+            "prompt": prompt,
+            "stream": stream,
+            "options": options
+        }
+        if self.structured_output:
+            payload["format"] = schema
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    def extract_json_from_text(self, text, domain=None, schema=None):
+        # Reasoning models wrap their answer in <think> blocks; drop them up front
+        text = ontology_schema.strip_reasoning(text)
+
+        if schema is not None:
+            # Structured output should parse as-is; only fall through to the
+            # heuristics below if the model ignored the requested format
+            try:
+                parsed = json.loads(text)
+                errors = ontology_schema.validate(parsed, schema)
+                if not errors:
+                    return parsed
+                print(f"Structured output failed schema validation: {errors[0]}", file=sys.stderr)
+            except json.JSONDecodeError:
+                print(f"Structured output was not valid JSON. Text (first 100 chars): {text[:100]}", file=sys.stderr)
+
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            print(f"Error parsing entire text as JSON. Text (first 100 chars): {text[:100]}", file=sys.stderr)
+            pass
+
+        # Look for JSON between curly braces
+        try:
+            json_start = text.find('{')
+            json_end = text.rfind('}') + 1
+
+            if json_start >= 0 and json_end > json_start:
+                json_str = text[json_start:json_end]
+                return json.loads(json_str)
+        except json.JSONDecodeError:
+            print(f"Error parsing JSON between braces. Text (first 100 chars): {text[:100]}", file=sys.stderr)
+            pass
+
+        # Look for code blocks that might contain JSON
+        code_block_pattern = r'```(?:json)?\s*([\s\S]*?)\s*```'
+        matches = re.findall(code_block_pattern, text, re.DOTALL)
+
+        for match in matches:
+            try:
+                return json.loads(match.strip())
+            except json.JSONDecodeError:
+                continue
+
+        # Return a minimal valid structure if all else fails
+        print(f"All JSON parsing attempts failed. Falling back to default ontology.", file=sys.stderr)
+
+        return self.create_fallback_ontology(domain if domain is not None else self.current_domain)
+
+    def validate_relationship(self, rel):
+        valid_cardinalities = ["1", "0..1", "0..*", "*", "1..*"]
+        default_cardinality = "1"
+        valid_categories = ["is-a", "part-of", "has", "performs", "associates-with"]
+        default_category = "associates-with"
+
+        if not isinstance(rel, dict):
+            return None
+
+        # Check required fields
+        if "from" not in rel or "to" not in rel or "relationship" not in rel:
+            return None
+
+        # Normalize the relationship with default values if missing
+        normalized = {
+            "from": str(rel["from"]),
+            "to": str(rel["to"]),
+            "relationship": str(rel["relationship"]),
+            "fromCardinality": rel.get("fromCardinality", default_cardinality),
+            "toCardinality": rel.get("toCardinality", default_cardinality),
+            "category": rel.get("category", default_category)
+        }
+
+        # Validate cardinalities
+        if normalized["fromCardinality"] not in valid_cardinalities:
+            normalized["fromCardinality"] = default_cardinality
+        if normalized["toCardinality"] not in valid_cardinalities:
+            normalized["toCardinality"] = default_cardinality
+
+        # Validate category
+        if normalized["category"] not in valid_categories:
+            normalized["category"] = default_category
+
+        return normalized
+
+    def create_fallback_ontology(self, domain):
+        relationships = [
+            {"from": f"{domain.capitalize()} Entity", "to": f"{domain.capitalize()} Component", "relationship": "contains", "fromCardinality": "1", "toCardinality": "*", "category": "part-of"},
+            {"from": f"{domain.capitalize()} Component", "to": f"{domain.capitalize()} Entity", "relationship": "is part of", "fromCardinality": "*", "toCardinality": "1", "category": "part-of"},
+            {"from": f"{domain.capitalize()} Actor", "to": f"{domain.capitalize()} Resource", "relationship": "uses", "fromCardinality": "1", "toCardinality": "1..*", "category": "performs"},
+            {"from": f"{domain.capitalize()} Process", "to": f"{domain.capitalize()} Output", "relationship": "produces", "fromCardinality": "1", "toCardinality": "0..*", "category": "has"}
+        ]
+        if not self.preset.typed:
+            relationships = [{field: rel[field] for field in ("from", "to", "relationship")} for rel in relationships]
+        return {"domain": domain, "relationships": relationships}
+
+    def validate_ontology_connectivity(self, ontology):
+        """
+        Ensures all entities in the ontology are connected in a single graph.
+        If disconnected components are found, links the best-connected entity
+        of each smaller component to the hub of the largest one.
+        Accepts either the JSON shape or an ontology_graph.Ontology and returns
+        the same object.
+        """
+        compact = isinstance(ontology, ontology_graph.Ontology)
+        components = ontology.components() if compact else ontology_graph.connected_components(ontology["relationships"])
+
+        # If we have multiple components, connect them
+        if len(components) > 1:
+            print(f"Found {len(components)} disconnected components in ontology, connecting them.", file=sys.stderr)
+
+            for connecting_rel in ontology_graph.bridging_relationships(components):
+                if compact:
+                    ontology.append(connecting_rel)
+                else:
+                    ontology["relationships"].append(connecting_rel)
+                print(f"Added connecting relationship: {connecting_rel['from']} -> {connecting_rel['to']}", file=sys.stderr)
+
+        return ontology
+
+    def _build_ontology_prompts(self, domain, count=None):
+        """
+        Returns the (system, user) prompt pair used to generate an ontology for
+        a domain, with `count` relationships: by default relationship_target
+        when it fits one call, else "10-15".
+        """
+        if count is None:
+            target = self.relationship_target
+            count = str(target) if target and not ontology_hierarchy.is_hierarchical(target) else "10-15"
+        return self.preset.system_prompt, self.preset.ontology_prompt(domain, count)
+
+    def generate_ontology(self, domain, num_ctx=4096, seed=None):
+        """
+        Returns the ontology for a domain, from the cache when possible. With a
+        `seed`, the seed ontology is expanded for the domain instead (see
+        expand_ontology).
+        """
+        if seed is not None:
+            return self.expand_ontology(domain, seed, num_ctx)
+
+        with self.metrics.trace(domain), self.metrics.span("generate_ontology"):
+            cache_key = self.cache_key(domain, num_ctx)
+            if "cache" not in self.stages:
+                return self.single_flight.do(cache_key, lambda: self._generate_ontology(domain, num_ctx, cache_key))
+
+            # 1) look for an existing cache entry
+            self.prefetcher.record(domain, num_ctx)
+            with self.metrics.span("cache_read"):
+                cached = self.cache.lookup(cache_key)
+            if cached is not None:
+                print(f"Loading ontology for '{domain}' from cache", file=sys.stderr)
+                if "enrich" in self.stages and self._lacks_details(cached):
+                    # cached by a lazy client; complete it before returning
+                    return self._fetch_details(domain, None, num_ctx)[0]
+                return cached
+
+            # an expired entry is better than waiting for generation and enrichment
+            stale = self.cache.get_stale(cache_key) if self.stale_while_revalidate else None
+            if stale is not None:
+                print(f"Serving stale ontology for '{domain}' and regenerating it in the background", file=sys.stderr)
+                self.prefetcher.revalidate(domain, num_ctx)
+                if "enrich" in self.stages and self._lacks_details(stale):
+                    # cached by a lazy client (or a streamed reply); complete a copy like a fresh hit
+                    return self._complete_details(stale, domain, num_ctx)
+                return stale
+
+            return self.single_flight.do(
+                cache_key,
+                lambda: self._generate_ontology(domain, num_ctx, cache_key),
+                lambda: self.cache.lookup(cache_key)
+            )
+
+    def refresh_ontology(self, domain, num_ctx=4096):
+        """Generates the ontology for a domain even if it is cached, replacing the cache entry"""
+        with self.metrics.trace(domain), self.metrics.span("refresh_ontology"):
+            cache_key = self.cache_key(domain, num_ctx)
+            return self.single_flight.do(cache_key, lambda: self._generate_ontology(domain, num_ctx, cache_key))
+
+    def _generate_ontology(self, domain, num_ctx, cache_key):
+        """Runs every stage but the cache lookup, which callers have already missed"""
+        try:
+            self.current_domain = domain
+            try:
+                with self.metrics.span("health_check"):
+                    self.endpoints.ensure()
+            except requests.exceptions.RequestException as e:
+                print(f"Error connecting to Ollama: {str(e)}", file=sys.stderr)
+                return {"domain": domain, "error": "Cannot connect to Ollama service", "relationships": []}
+
+            if ontology_hierarchy.is_hierarchical(self.relationship_target):
+                ontology = self._generate_hierarchical(domain, num_ctx)
+            else:
+                ontology = self._generate_single(domain, num_ctx)
+                if ontology is None:
+                    return self.create_fallback_ontology(domain)
+
+            return self._finish_ontology(ontology, domain, num_ctx, cache_key)
+
+        # return error and fallback ontology
+        except Exception as e:
+            print(f"Error generating ontology: {str(e)}", file=sys.stderr)
+            self.endpoints.invalidate()
+            traceback.print_exc(file=sys.stderr)
+
+            fallback = self.create_fallback_ontology(domain)
+            fallback["error"] = str(e)
+            return fallback
+
+    def _generate_single(self, domain, num_ctx):
+        """The generate and parse stages in one call; returns None if Ollama answers with an error"""
+        print(f"Generating ontology for domain: {domain}", file=sys.stderr)
+
+        with self.metrics.span("prompt_build"):
+            system_prompt, user_prompt = self._build_ontology_prompts(domain)
+
+        print(f"Sending request to Ollama", file=sys.stderr)
+        with self.metrics.span("llm_generate"):
+            response = self.endpoints.post(
+                "/api/generate",
+                json=self._build_payload(system_prompt, user_prompt, {"num_ctx": num_ctx}, self.schema),
+                timeout=120
+            )
+
+        if response.status_code != 200:
+            print(f"Error response from Ollama: {response.status_code}", file=sys.stderr)
+            return None
+
+        # Extract and parse the response
+        reply = response.json()
+        self.metrics.record_ollama("generate", reply)
+        result = reply.get("response", "")
+        print(f"Received response from Ollama (first 100 chars): {result[:100]}", file=sys.stderr)
+
+        with self.metrics.span("json_extraction"):
+            return self.extract_json_from_text(result, domain, self.schema if self.structured_output else None)
+
+    def _finish_ontology(self, ontology, domain, num_ctx, cache_key):
+        """The stages after parsing: validate, connect, enrich and cache"""
+        ontology = self._validate_ontology(ontology, domain)
+
+        # Enhance ontology with additional information for each relationship
+        if "enrich" in self.stages:
+            with self.metrics.span("enrichment", relationships=len(ontology["relationships"])):
+                ontology = self.enhance_relationships(ontology, num_ctx)
+        elif "enrich" in self.preset.stages:
+            print(f"Skipping enrichment, details are fetched on demand", file=sys.stderr)
+
+        # 2) write the fresh result to cache
+        if "cache" in self.stages:
+            print(f"Writing ontology for '{domain}' to cache", file=sys.stderr)
+            with self.metrics.span("cache_write"):
+                self.cache.put(cache_key, ontology)
+
+        return ontology
+
+    def _validate_ontology(self, ontology, domain):
+        """
+        Runs the validate and connect stages on a parsed ontology. Whichever
+        of them run, the result has a string domain and well-formed
+        relationships (the fallback ones if the reply had none).
+        """
+        # Ensure domain is set as a string
+        if "domain" not in ontology or not isinstance(ontology["domain"], str):
+            ontology["domain"] = domain
+
+        # Ensure relationships exist, keeping only the well-formed ones
+        relationships = ontology.get("relationships")
+        if isinstance(relationships, list):
+            relationships = [rel for rel in relationships if isinstance(rel, dict) and "from" in rel and "to" in rel and "relationship" in rel]
+        if not relationships:
+            print(f"No valid relationships found in response, using fallback", file=sys.stderr)
+            relationships = self.create_fallback_ontology(domain)["relationships"]
+        ontology["relationships"] = relationships
+
+        graph = None
+        if "validate" in self.stages:
+            with self.metrics.span("validation"):
+                # Fold entity aliases and drop repeated relationships, so neither
+                # connectivity repair nor enrichment sees them
+                relationships, renamed, removed = ontology_graph.canonicalize(ontology["relationships"])
+                if renamed or removed:
+                    print(f"Canonicalized relationships: {renamed} renamed to a shared entity name, {removed} duplicates removed", file=sys.stderr)
+                ontology["relationships"] = relationships or self.create_fallback_ontology(domain)["relationships"]
+
+                if self.preset.typed:
+                    # Validate each relationship into the compact graph form; it is only
+                    # turned back into the JSON shape after connectivity repair
+                    graph = ontology_graph.Ontology.from_dict(ontology)
+
+        # Ensure the ontology is fully connected
+        if "connect" in self.stages:
+            with self.metrics.span("connectivity_repair"):
+                if self.preset.typed:
+                    graph = self.validate_ontology_connectivity(graph or ontology_graph.Ontology.from_dict(ontology))
+                else:
+                    ontology = self.validate_ontology_connectivity(ontology)
+
+        return graph.to_dict() if graph is not None else ontology
+
+    def _build_cluster_prompts(self, domain, concept, concepts, count):
+        """Returns the (system, user) prompt pair generating the part of an ontology around one concept"""
+        system_prompt, user_prompt = self._build_ontology_prompts(domain, count)
+        return system_prompt, user_prompt + ontology_hierarchy.build_cluster_instructions(domain, concept, concepts)
+
+    def _generate_hierarchical(self, domain, num_ctx):
+        """
+        The generate and parse stages for an ontology of about
+        relationship_target relationships, in two levels (see
+        ontology_hierarchy): one call for the top-level concepts, then one
+        call per concept with up to max_parallel in flight. Returns the
+        clusters merged into one connected ontology without duplicates.
+        """
+        target = self.relationship_target
+        print(f"Generating ontology for domain: {domain} (about {target} relationships, concept by concept)", file=sys.stderr)
+
+        with self.metrics.span("llm_concepts"):
+            concepts, skeleton = self._generate_concepts(domain, ontology_hierarchy.concept_count(target), num_ctx)
+        if not concepts:
+            raise Exception("The model named no top-level concepts")
+
+        count = ontology_hierarchy.cluster_size(target, len(concepts))
+        print(f"Generating {len(concepts)} concept clusters of {count} relationships with up to {self.max_parallel} in flight", file=sys.stderr)
+        with self.metrics.span("llm_clusters", clusters=len(concepts)):
+            with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(concepts))) as executor:
+                # run each cluster in a copy of this context so its spans keep the trace id
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self._generate_cluster, domain, concept, concepts, count, num_ctx)
+                    for concept in concepts
+                ]
+                clusters = [future.result() for future in futures]
+
+        with self.metrics.span("merge", clusters=len(clusters)):
+            return ontology_hierarchy.merge_clusters(domain, [skeleton] + clusters, self.create_fallback_ontology(domain)["relationships"])
+
+    def _generate_concepts(self, domain, count, num_ctx):
+        """Asks for the top-level concepts of a domain; returns (concept names, relationships between them)"""
+        system_prompt, _ = self._build_ontology_prompts(domain)
+        response = self.endpoints.post(
+            "/api/generate",
+            json=self._build_payload(system_prompt, ontology_hierarchy.build_concepts_prompt(domain, count), {"num_ctx": num_ctx}, ontology_schema.CONCEPTS_SCHEMA),
+            timeout=120
+        )
+        if response.status_code != 200:
+            raise Exception(f"Ollama error {response.status_code}")
+
+        reply = response.json()
+        self.metrics.record_ollama("concepts", reply)
+        with self.metrics.span("json_extraction"):
+            parsed = self.extract_json_from_text(reply.get("response", ""), domain, ontology_schema.CONCEPTS_SCHEMA if self.structured_output else None)
+        concepts, relationships = ontology_hierarchy.parse_concepts(parsed, count)
+        print(f"Top-level concepts: {', '.join(concepts)}", file=sys.stderr)
+        return concepts, relationships
+
+    def _generate_cluster(self, domain, concept, concepts, count, num_ctx):
+        """Generates the relationships around one concept; a failed call yields none instead of failing the ontology"""
+        with self.metrics.span("cluster", concept=concept):
+            try:
+                system_prompt, user_prompt = self._build_cluster_prompts(domain, concept, concepts, count)
+                response = self.endpoints.post(
+                    "/api/generate",
+                    json=self._build_payload(system_prompt, user_prompt, {"num_ctx": num_ctx}, self.schema),
+                    timeout=120
+                )
+                if response.status_code != 200:
+                    raise Exception(f"Ollama error {response.status_code}")
+
+                reply = response.json()
+                self.metrics.record_ollama("cluster", reply)
+                parsed = self.extract_json_from_text(reply.get("response", ""), domain, self.schema if self.structured_output else None)
+                relationships = parsed.get("relationships") if isinstance(parsed, dict) else parsed
+                return relationships if isinstance(relationships, list) else []
+            except Exception as e:
+                print(f"Error generating relationships around '{concept}': {str(e)}", file=sys.stderr)
+                return []
+
+    def _build_expansion_prompts(self, domain, seed):
+        """Returns the (system, user) prompt pair asking only for relationships the seed lacks"""
+        existing = "\n".join(
+            f"        - {rel.get('from')} {rel.get('relationship')} {rel.get('to')}"
+            for rel in seed.get("relationships", []) if isinstance(rel, dict)
+        )
+        return self.preset.system_prompt, self.preset.expansion_prompt(domain, seed.get("domain", domain), existing)
+
+    def expand_ontology(self, domain, seed, num_ctx=4096):
+        """
+        Grows an existing ontology instead of generating one from scratch.
+        `seed` is an ontology, or the name of a domain whose ontology is taken
+        from the cache (and generated first if it is not cached). The model is
+        shown the seed's relationships and asked only for new ones; those are
+        merged in without duplicates and go through the later stages on their
+        own. The result replaces the cached ontology for `domain`.
+        """
+        if isinstance(seed, str):
+            seed = self.generate_ontology(seed, num_ctx)
+
+        with self.metrics.trace(domain), self.metrics.span("expand_ontology"):
+            cache_key = self.cache_key(domain, num_ctx)
+            return self.single_flight.do(cache_key, lambda: self._expand_ontology(domain, seed, num_ctx, cache_key))
+
+    def _expand_ontology(self, domain, seed, num_ctx, cache_key):
+        """Asks for relationships the seed lacks, merges them in, enriches the new ones and caches the result"""
+        # The seed may be a shared cache entry; work on copies of its relationships
+        existing = [dict(rel) for rel in seed.get("relationships", []) if isinstance(rel, dict)]
+        ontology = {"domain": domain, "relationships": existing}
+
+        try:
+            self.current_domain = domain
+            try:
+                with self.metrics.span("health_check"):
+                    self.endpoints.ensure()
+            except requests.exceptions.RequestException as e:
+                print(f"Error connecting to Ollama: {str(e)}", file=sys.stderr)
+                return dict(ontology, error="Cannot connect to Ollama service")
+
+            print(f"Expanding ontology for domain: {domain} ({len(existing)} existing relationships)", file=sys.stderr)
+
+            with self.metrics.span("prompt_build"):
+                system_prompt, user_prompt = self._build_expansion_prompts(domain, seed)
+
+            with self.metrics.span("llm_generate"):
+                response = self.endpoints.post(
+                    "/api/generate",
+                    json=self._build_payload(system_prompt, user_prompt, {"num_ctx": num_ctx}, self.schema),
+                    timeout=120
+                )
+
+            if response.status_code != 200:
+                print(f"Error response from Ollama: {response.status_code}", file=sys.stderr)
+                return dict(ontology, error=f"Ollama error {response.status_code}")
+
+            reply = response.json()
+            self.metrics.record_ollama("expand", reply)
+            result = reply.get("response", "")
+
+            with self.metrics.span("json_extraction"):
+                candidates = self.extract_json_from_text(result, domain, self.schema if self.structured_output else None)
+
+            with self.metrics.span("validation"):
+                candidates = candidates.get("relationships") if isinstance(candidates, dict) else candidates
+                if not isinstance(candidates, list):
+                    candidates = []
+                candidates = [rel for rel in candidates if isinstance(rel, dict) and "from" in rel and "to" in rel and "relationship" in rel]
+                if "validate" in self.stages:
+                    # spell entities the seed already has the seed's way
+                    candidates, _, _ = ontology_graph.canonicalize(candidates, existing)
+                    if self.preset.typed:
+                        candidates = [self.validate_relationship(rel) for rel in candidates]
+                # the placeholder relationships returned when parsing fails are never new
+                fallback = self.create_fallback_ontology(domain)["relationships"]
+                added = ontology_graph.new_relationships(existing + fallback, candidates)
+                ontology["relationships"] = existing + added
+                print(f"Model proposed {len(candidates)} relationships, {len(added)} of them new", file=sys.stderr)
+
+            if "connect" in self.stages:
+                with self.metrics.span("connectivity_repair"):
+                    ontology = self.validate_ontology_connectivity(ontology)
+
+            # Only the new relationships (and any seed relationships that never
+            # got details) are enriched
+            if "enrich" in self.stages:
+                pending = [rel for rel in ontology["relationships"] if "details" not in rel]
+                with self.metrics.span("enrichment", relationships=len(pending)):
+                    if pending:
+                        self.enhance_relationships({"domain": domain, "relationships": pending}, num_ctx)
+
+            if "cache" in self.stages:
+                print(f"Writing ontology for '{domain}' to cache", file=sys.stderr)
+                with self.metrics.span("cache_write"):
+                    self.cache.put(cache_key, ontology)
+
+            return ontology
+
+        # return the seed unchanged with the error
+        except Exception as e:
+            print(f"Error expanding ontology: {str(e)}", file=sys.stderr)
+            self.endpoints.invalidate()
+            traceback.print_exc(file=sys.stderr)
+            return dict(ontology, error=str(e))
+
+    def stream_relationships(self, domain, num_ctx=4096):
+        """
+        Generates an ontology through Ollama's streaming API and yields each
+        relationship as soon as it has been fully received.
+        Falls back to the default relationships if the model produced none.
+        A stream that completes is validated like a generated ontology and
+        cached without details, like a lazy client's ontologies;
+        generate_ontology adds them when asked.
+        """
+        # Cached ontologies are complete already; replay them
+        cache_key = self.cache_key(domain, num_ctx)
+        cached = self.cache.lookup(cache_key) if "cache" in self.stages else None
+        if cached is not None:
+            print(f"Streaming ontology for '{domain}' from cache", file=sys.stderr)
+            for rel in cached.get("relationships", []):
+                yield rel
+            return
+
+        self.current_domain = domain
+        try:
+            self.endpoints.ensure()
+        except requests.exceptions.RequestException as e:
+            print(f"Error connecting to Ollama: {str(e)}", file=sys.stderr)
+            return
+
+        print(f"Streaming ontology for domain: {domain}", file=sys.stderr)
+        system_prompt, user_prompt = self._build_ontology_prompts(domain)
+        parser = ontology_stream.RelationshipStreamParser()
+        normalize = self.preset.typed and "validate" in self.stages
+        emitted = []
+        completed = False
+
+        try:
+            with self.endpoints.stream(
+                "/api/generate",
+                json=self._build_payload(system_prompt, user_prompt, {"num_ctx": num_ctx}, self.schema, stream=True),
+                timeout=120
+            ) as response:
+                if response.status_code != 200:
+                    print(f"Error response from Ollama: {response.status_code}", file=sys.stderr)
+                else:
+                    for fragment in ontology_stream.iter_response_text(response):
+                        for rel in parser.feed(fragment):
+                            if normalize:
+                                rel = self.validate_relationship(rel)
+                                if not rel:
+                                    continue
+                            emitted.append(rel)
+                            yield rel
+                    self.metrics.record_ollama("stream", response.final_chunk)
+                    completed = response.final_chunk is not None
+        except Exception as e:
+            print(f"Error streaming ontology: {str(e)}", file=sys.stderr)
+            self.endpoints.invalidate()
+
+        if not emitted:
+            print(f"No valid relationships streamed, using fallback", file=sys.stderr)
+            completed = False
+            emitted = self.create_fallback_ontology(domain)["relationships"]
+            for rel in emitted:
+                yield rel
+
+        # Connecting relationships can only be known once the whole graph is in
+        if "connect" in self.stages:
+            ontology = self.validate_ontology_connectivity({"domain": domain, "relationships": list(emitted)})
+            for rel in ontology["relationships"][len(emitted):]:
+                yield rel
+
+        if completed and "cache" in self.stages:
+            # generate_ontology serves this entry too, so it goes through the same
+            # validate and connect stages (aliases folded, repeats dropped)
+            ontology = self._validate_ontology({"domain": domain, "relationships": copy.deepcopy(emitted)}, domain)
+            print(f"Writing streamed ontology for '{domain}' to cache", file=sys.stderr)
+            with self.metrics.span("cache_write"):
+                self.cache.put(cache_key, ontology)
+
+    def enhance_relationships(self, ontology, num_ctx=4096):
+        """
+        Adds detailed information for each relationship in the ontology.
+        Relationships are packed into as few calls as fit the `num_ctx` token
+        window, and up to max_parallel batches run concurrently. Entity
+        definitions are taken from the definition store where possible; each
+        remaining entity is defined by the model once, however many
+        relationships it appears in. Entities whose batch failed are asked
+        for once more, definitions only, unless Ollama could not be reached.
+        """
+        print(f"Enhancing ontology with details for each relationship...", file=sys.stderr)
+        domain = ontology.get("domain", "unknown")
+
+        # Get all relationships for batching
+        relationships = ontology.get("relationships", [])
+        if not relationships:
+            return ontology
+
+        batches, batch_needs, known = self._plan_enrichment(domain, relationships, num_ctx)
+
+        learned = {}
+        retried = []
+        failures = []
+        self._run_enrichment_batches(domain, batches, batch_needs, learned, num_ctx, retried, failures)
+
+        missing = self._missing_definitions(relationships, known, learned)
+        if missing and self._can_follow_up(missing, failures, requests.exceptions.RequestException):
+            for chunk in self._definition_chunks(missing, num_ctx):
+                try:
+                    self._define_entities(domain, chunk, learned, num_ctx)
+                except requests.exceptions.RequestException as e:
+                    print(f"Error requesting missing definitions: {str(e)}", file=sys.stderr)
+                    break
+
+        self._finish_enrichment(domain, relationships, known, learned, retried)
+        return ontology
+
+    def _run_enrichment_batches(self, domain, batches, batch_needs, learned, num_ctx, retried, failures):
+        """Runs enrichment batches, up to max_parallel at a time"""
+        if self.max_parallel <= 1 or len(batches) == 1:
+            for batch, needs in zip(batches, batch_needs):
+                self._enhance_batch(domain, batch, needs, learned, num_ctx, retried, failures)
+            return
+        # Each batch writes details into its own relationship dicts, so
+        # results land in the original order whatever order calls finish in
+        print(f"Enhancing {len(batches)} batches with up to {self.max_parallel} in flight", file=sys.stderr)
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(batches))) as executor:
+            # run each batch in a copy of this context so its spans keep the trace id
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._enhance_batch, domain, batch, needs, learned, num_ctx, retried, failures)
+                for batch, needs in zip(batches, batch_needs)
+            ]
+            for future in futures:
+                future.result()
+
+    def fetch_details(self, domain, relationships=None, num_ctx=4096):
+        """
+        Returns {"domain", "relationships"} with details for selected
+        relationships of a domain's ontology, which is generated first if it
+        is not cached. `relationships` lists edge indices and/or dicts with
+        "from", "relationship" and "to" (None selects all). Only relationships
+        without details are sent to the model, and their details are merged
+        into the cached ontology.
+        """
+        ontology, selected = self._fetch_details(domain, relationships, num_ctx)
+        result = {"domain": ontology.get("domain", domain), "relationships": selected}
+        if "error" in ontology:
+            result["error"] = ontology["error"]
+        return result
+
+    def _fetch_details(self, domain, selectors, num_ctx):
+        """Returns (the ontology with details merged in, the selected relationships)"""
+        with self.metrics.trace(domain), self.metrics.span("fetch_details"):
+            cache_key = self.cache_key(domain, num_ctx)
+            ontology = self.cache.lookup(cache_key)
+            if ontology is None:
+                ontology = self.generate_ontology(domain, num_ctx)
+            if "error" in ontology:
+                return ontology, []
+
+            # The cached ontology is shared; enrich copies of what lacks details
+            pending = [copy.deepcopy(rel) for rel in self._select_relationships(ontology, selectors) if "details" not in rel]
+            if pending:
+                print(f"Fetching details for {len(pending)} relationships of '{domain}'", file=sys.stderr)
+                with self.metrics.span("enrichment", relationships=len(pending)):
+                    self.enhance_relationships({"domain": ontology.get("domain", domain), "relationships": pending}, num_ctx)
+                details = {ontology_graph.relationship_key(rel): rel["details"] for rel in pending}
+
+                def merge(current):
+                    for rel in current.get("relationships", []):
+                        if "details" not in rel and ontology_graph.relationship_key(rel) in details:
+                            rel["details"] = details[ontology_graph.relationship_key(rel)]
+                    return current
+
+                with self.metrics.span("cache_write"):
+                    merged = self.cache.update(cache_key, merge)
+                    if merged is None:
+                        # served from a similar domain's entry (or not cached); store it under this key
+                        merged = merge(copy.deepcopy(ontology))
+                        self.cache.put(cache_key, merged)
+                ontology = merged
+
+            return ontology, self._select_relationships(ontology, selectors)
+
+    def _select_relationships(self, ontology, selectors):
+        """The relationships picked by fetch_details selectors, in the order given"""
+        relationships = ontology.get("relationships", [])
+        if selectors is None:
+            return list(relationships)
+        by_key = {ontology_graph.relationship_key(rel): rel for rel in relationships}
+        selected = []
+        for selector in selectors:
+            if isinstance(selector, dict):
+                rel = by_key.get(ontology_graph.relationship_key(selector))
+            elif isinstance(selector, int) and not isinstance(selector, bool) and 0 <= selector < len(relationships):
+                rel = relationships[selector]
+            else:
+                rel = None
+            if rel is not None:
+                selected.append(rel)
+        return selected
+
+    def _lacks_details(self, ontology):
+        return any(isinstance(rel, dict) and "details" not in rel for rel in ontology.get("relationships", []))
+
+    def _complete_details(self, ontology, domain, num_ctx):
+        """
+        Returns a copy of an ontology that is not under its own cache key (a
+        stale one) with details for the relationships lacking them; the
+        regeneration under way replaces the cache entry, so it is not written.
+        """
+        ontology = copy.deepcopy(ontology)
+        pending = [rel for rel in ontology.get("relationships", []) if isinstance(rel, dict) and "details" not in rel]
+        print(f"Fetching details for {len(pending)} relationships of '{domain}'", file=sys.stderr)
+        with self.metrics.span("enrichment", relationships=len(pending)):
+            self.enhance_relationships({"domain": ontology.get("domain", domain), "relationships": pending}, num_ctx)
+        return ontology
+
+    def _plan_enrichment(self, domain, relationships, num_ctx):
+        """
+        Splits relationships into enrichment batches that fit the context
+        window. Returns (batches, the entities each batch has to define,
+        the definitions already stored).
+        """
+        # Ask for a definition only in the first relationship that mentions an
+        # entity the store does not know yet
+        entities = list(dict.fromkeys(str(rel.get(side, "")) for rel in relationships for side in ("from", "to")))
+        known = self.definitions.lookup(domain, entities)
+        assigned = {ontology_definitions.normalize(entity) for entity in known}
+        rel_needs = []
+        for rel in relationships:
+            needs = set()
+            for entity in (str(rel.get("from", "")), str(rel.get("to", ""))):
+                if ontology_definitions.normalize(entity) not in assigned:
+                    assigned.add(ontology_definitions.normalize(entity))
+                    needs.add(entity)
+            rel_needs.append(needs)
+        print(f"Reusing {len(known)} of {len(entities)} entity definitions", file=sys.stderr)
+
+        batches, batch_needs = self._pack_enrichment(domain, relationships, rel_needs, num_ctx)
+        return batches, batch_needs, known
+
+    def _pack_enrichment(self, domain, relationships, rel_needs, num_ctx):
+        """
+        Groups relationships (with the entities each has to define) into
+        batches that fit the context window. Returns (batches, the entities
+        each batch has to define).
+        """
+        # Pack as many relationships per call as the context window holds:
+        # the prompt around them and the reply overhead are paid once per call
+        budget = (int(num_ctx * ontology_tokens.CONTEXT_FILL)
+                  - ontology_tokens.estimate_tokens(ENRICHMENT_SYSTEM_PROMPT)
+                  - ontology_tokens.estimate_tokens(self._build_enrichment_prompt(domain, []))
+                  - ENRICHMENT_REPLY_OVERHEAD)
+        costs = [
+            ontology_tokens.estimate_tokens(self._relationship_prompt(rel, needs))
+            + ENRICHMENT_TOKENS_PER_RELATIONSHIP + ENRICHMENT_TOKENS_PER_DEFINITION * len(needs)
+            for rel, needs in zip(relationships, rel_needs)
+        ]
+        batches = ontology_tokens.pack_batches(list(range(len(relationships))), costs, budget, self.enrichment_batch_size.limit)
+        batch_needs = [set().union(*(rel_needs[i] for i in batch)) for batch in batches]
+        batches = [[relationships[i] for i in batch] for batch in batches]
+        print(f"Enhancing {len(relationships)} relationships in {len(batches)} batches "
+              f"(about {budget} tokens each, at most {self.enrichment_batch_size.limit} relationships)", file=sys.stderr)
+
+        return batches, batch_needs
+
+    def _missing_definitions(self, relationships, known, learned):
+        """Entities of the relationships that neither the store nor this enrichment has defined"""
+        defined = {ontology_definitions.normalize(entity) for entity in known}
+        defined.update(ontology_definitions.normalize(entity) for entity in learned)
+        missing = {}
+        for rel in relationships:
+            for entity in (str(rel.get("from", "")), str(rel.get("to", ""))):
+                if ontology_definitions.normalize(entity) not in defined:
+                    missing.setdefault(ontology_definitions.normalize(entity), entity)
+        return list(missing.values())
+
+    def _can_follow_up(self, missing, failures, transport_errors):
+        """
+        Whether to ask again for the missing definitions: not when an
+        enrichment call failed to reach Ollama (`transport_errors` are the
+        exception types meaning that) or no endpoint passes its health check,
+        as the follow-up would only wait out the same failure again.
+        """
+        if any(isinstance(error, transport_errors) for error in failures):
+            print(f"Not asking again for {len(missing)} missing entity definitions, Ollama could not be reached", file=sys.stderr)
+            return False
+        try:
+            self.endpoints.ensure()
+        except requests.exceptions.RequestException:
+            print(f"Not asking again for {len(missing)} missing entity definitions, Ollama is unavailable", file=sys.stderr)
+            return False
+        print(f"Asking again for {len(missing)} missing entity definitions", file=sys.stderr)
+        return True
+
+    def _definition_chunks(self, entities, num_ctx):
+        """Splits the entities of a definitions-only follow-up into calls that fit the context window"""
+        budget = (int(num_ctx * ontology_tokens.CONTEXT_FILL)
+                  - ontology_tokens.estimate_tokens(ENRICHMENT_SYSTEM_PROMPT)
+                  - ontology_tokens.estimate_tokens(self._build_definitions_prompt("", []))
+                  - ENRICHMENT_REPLY_OVERHEAD)
+        size = max(1, budget // ENRICHMENT_TOKENS_PER_DEFINITION)
+        return [entities[i:i + size] for i in range(0, len(entities), size)]
+
+    def _build_definitions_prompt(self, domain, entities):
+        """Asks only for the definitions of `entities`, for the follow-up after failed enrichment batches"""
+        entity_lines = "\n".join(f"        Entity: {entity}" for entity in entities)
+        return f"""
+        Define each of these entities of the {domain} domain in 2-3 sentences: its key characteristics, purpose, and role in the domain.
+
+{entity_lines}
+
+        Format as a JSON object matching this structure:
+        {{
+            "definitions": [
+            {{"entity": "the entity name exactly as given", "definition": "Thorough definition..."}},
+            // next entity...
+            ]
+        }}
+
+        Output ONLY valid JSON without extra text.
+        """
+
+    def _build_definitions_payload(self, domain, entities, num_ctx):
+        return self._build_payload(ENRICHMENT_SYSTEM_PROMPT, self._build_definitions_prompt(domain, entities), {
+            "temperature": 0.3,
+            "top_p": 0.9,
+            "num_ctx": num_ctx
+        }, ontology_schema.DEFINITIONS_SCHEMA)
+
+    def _define_entities(self, domain, entities, learned, num_ctx):
+        """Asks Ollama for the definitions of `entities` only; raises RequestException if it cannot be reached"""
+        with self.metrics.span("llm_define", entities=len(entities)):
+            response = self.endpoints.post("/api/generate", json=self._build_definitions_payload(domain, entities, num_ctx), timeout=120)
+        if response.status_code != 200:
+            print(f"Error response from Ollama for missing definitions: {response.status_code}", file=sys.stderr)
+            return
+        reply = response.json()
+        self.metrics.record_ollama("define", reply)
+        self._apply_definitions_reply(domain, entities, learned, reply)
+
+    def _apply_definitions_reply(self, domain, entities, learned, reply):
+        """Adds the definitions in a definitions-only reply to `learned`, for the requested entities only"""
+        result = self.extract_json_from_text(
+            reply.get("response", ""), domain, ontology_schema.DEFINITIONS_SCHEMA if self.structured_output else None
+        )
+        definitions = result.get("definitions") if isinstance(result, dict) else None
+        requested = {ontology_definitions.normalize(entity): entity for entity in entities}
+        for entry in definitions if isinstance(definitions, list) else []:
+            if not isinstance(entry, dict) or not isinstance(entry.get("definition"), str) or not entry["definition"].strip():
+                continue
+            entity = requested.get(ontology_definitions.normalize(entry.get("entity", "")))
+            if entity is not None:
+                learned[entity] = entry["definition"]
+
+    def _finish_enrichment(self, domain, relationships, known, learned, retried):
+        """Applies the shared entity definitions to every relationship and stores the new ones"""
+        if not retried:
+            self.enrichment_batch_size.grow()
+
+        # Every relationship gets the shared definition of its entities, whichever
+        # batch (or earlier run) produced it
+        definitions = {ontology_definitions.normalize(entity): text for entity, text in known.items()}
+        definitions.update((ontology_definitions.normalize(entity), text) for entity, text in learned.items())
+        for rel in relationships:
+            details = rel.get("details")
+            if not isinstance(details, dict):
+                continue
+            for side, field in (("from", "from_definition"), ("to", "to_definition")):
+                definition = definitions.get(ontology_definitions.normalize(rel.get(side, "")))
+                if definition:
+                    details[field] = definition
+        self.definitions.update(domain, learned)
+
+    def _relationship_prompt(self, rel, needs=None):
+        """The part of the enrichment prompt describing one relationship"""
+        from_entity = rel.get("from", "Entity")
+        to_entity = rel.get("to", "Entity")
+        relationship = rel.get("relationship", "relates to")
+
+        define = [entity for entity in dict.fromkeys((str(from_entity), str(to_entity))) if needs is None or entity in needs]
+        return (
+            f"Relationship: {from_entity} {relationship} {to_entity}\n"
+            f"Define: {', '.join(define) if define else 'none'}\n"
+            f"Analyze in depth with comprehensive explanations and examples."
+        )
+
+    def _enrichment_instructions(self):
+        """
+        The fixed start of every enrichment prompt. It mentions no domain or
+        relationship, so Ollama can reuse its evaluation (KV cache) from one
+        call to the next and only evaluates the batch-specific rest.
+        """
+        entry_format = """{
+                "relationship": "entity1 action entity2",
+                "from_definition": "Thorough definition of entity1...",
+                "to_definition": "Thorough definition of entity2...",
+                "relationship_explanation": "Comprehensive explanation of the relationship...",
+                "examples": ["Example 1 with context...", "Example 2 with context..."],
+                "significance": "Why this relationship matters..."
+            }"""
+        if self.structured_output:
+            # structured output has to be a JSON object, so the entries are wrapped
+            output_format = f"""Format as a JSON object with a "relationships" array of objects matching this structure:
+        {{
+            "relationships": [
+            {entry_format},
+            // next relationship...
+            ]
+        }}"""
+        else:
+            output_format = f"""Format as a JSON array of objects matching this structure:
+        [
+            {entry_format},
+            // next relationship...
+        ]"""
+        return f"""
+        You will be given a domain and a list of relationships between its entities. Provide in-depth information about each relationship.
+
+        For EACH relationship, provide:
+
+        1. Only if the source entity is listed under "Define": a thorough definition of it (2-3 sentences) - explain its key characteristics, purpose, and role in the domain. Otherwise leave out "from_definition".
+
+        2. Only if the target entity is listed under "Define": a thorough definition of it (2-3 sentences) - explain its key characteristics, purpose, and role in the domain. Otherwise leave out "to_definition".
+
+        3. A comprehensive explanation of their relationship (3-4 sentences) - describe how these entities interact, the nature of their relationship, constraints, and implications
+
+        4. 2-3 specific examples showing this relationship in real-world scenarios, with context and impact
+
+        5. The significance of this relationship in the domain (1-2 sentences) - why this relationship matters
+
+        {output_format}
+
+        Provide substantial detail in each section. Output ONLY valid JSON without extra text.
+        """
+
+    def _build_enrichment_prompt(self, domain, batch, needs=None):
+        """
+        Builds the combined enrichment prompt for one batch of relationships:
+        the fixed instructions first, then the domain and the batch. Only the
+        entities in `needs` are to be defined (all of them if None).
+        """
+        # Create prompts for each relationship in the batch
+        batch_prompts = [self._relationship_prompt(rel, needs) for rel in batch]
+
+        # Combine all prompts in the batch with requests for more depth
+        batch_text = '\n\n'.join(batch_prompts)
+
+        combined_prompt = self._enrichment_instructions() + f"""
+        Domain: {domain}
+
+        {batch_text}
+
+        Answer for these relationships of the {domain} domain only.
+        """
+
+        return combined_prompt
+
+    def _enhance_batch(self, domain, batch, needs, learned, num_ctx, retried, failures):
+        """
+        Fetches details for one batch of relationships. If the reply is
+        truncated or unparseable, the relationships it did not cover are
+        retried in two halves; single relationships fall back to defaults.
+        The errors of failed calls are appended to `failures`.
+        """
+        with self.metrics.span("enrichment_batch", size=len(batch), definitions=len(needs)):
+            remaining = self._enhance_batch_details(domain, batch, needs, learned, num_ctx, failures)
+
+        if remaining and len(remaining) > 1:
+            retried.append(len(batch))
+            limit = self.enrichment_batch_size.shrink(len(batch))
+            print(f"Retrying {len(remaining)} relationships in smaller batches (limit now {limit})", file=sys.stderr)
+            half = (len(remaining) + 1) // 2
+            self._enhance_batch(domain, remaining[:half], needs, learned, num_ctx, retried, failures)
+            self._enhance_batch(domain, remaining[half:], needs, learned, num_ctx, retried, failures)
+        else:
+            for rel in remaining:
+                self._add_default_details(rel)
+
+    def _enhance_batch_details(self, domain, batch, needs, learned, num_ctx, failures):
+        """
+        Queries Ollama for one batch and writes details into its relationships.
+        New definitions of the entities in `needs` go into `learned`.
+        Returns the relationships the reply did not cover; on request errors
+        they get default details instead, the error goes into `failures` and
+        nothing is returned.
+        """
+        try:
+            # Query Ollama with the batch prompt, allowing more tokens for detailed responses
+            with self.metrics.span("llm_enrich"):
+                response = self.endpoints.post(
+                    "/api/generate",
+                    json=self._build_enrichment_payload(domain, batch, needs, num_ctx),
+                    timeout=120  # Increased timeout for more comprehensive generation
+                )
+
+            if response.status_code != 200:
+                raise Exception(f"LLM error {response.status_code}")
+
+            reply = response.json()
+            self.metrics.record_ollama("enrich", reply)
+            return self._apply_enrichment_reply(domain, batch, needs, learned, reply)
+
+        except Exception as e:
+            print(f"Error enhancing relationship batch: {str(e)}", file=sys.stderr)
+            failures.append(e)
+            # Add minimal details on error
+            for rel in batch:
+                self._add_default_details(rel)
+            return []
+
+    def _build_enrichment_payload(self, domain, batch, needs, num_ctx):
+        """Builds the /api/generate request body for one enrichment batch"""
+        return self._build_payload(ENRICHMENT_SYSTEM_PROMPT, self._build_enrichment_prompt(domain, batch, needs), {
+            "temperature": 0.3,  # Slightly higher temperature for more detailed responses
+            "top_p": 0.9,
+            "num_ctx": num_ctx
+        }, ontology_schema.ENRICHMENT_SCHEMA)
+
+    def warm_up(self, num_ctx=4096):
+        """
+        Loads the model on every endpoint, so the first requests do not wait
+        for it. With enrichment, the model also evaluates the fixed part of
+        the enrichment prompt once, which later batches then reuse. Returns
+        (endpoint URL, True or error message) pairs.
+        """
+        if "enrich" in self.stages:
+            system, prompt, options = ENRICHMENT_SYSTEM_PROMPT, self._enrichment_instructions(), {"num_ctx": num_ctx, "num_predict": 1}
+        else:
+            # an empty prompt only loads the model
+            system, prompt, options = "", "", {"num_ctx": num_ctx}
+        payload = self._build_payload(system, prompt, options, None)
+        payload.pop("format", None)
+        outcomes = []
+        for url, response in self.endpoints.post_each("/api/generate", json=payload, timeout=300):
+            if isinstance(response, Exception) or response.status_code != 200:
+                error = str(response) if isinstance(response, Exception) else f"HTTP {response.status_code}"
+                print(f"Could not warm up {self.model} at {url}: {error}", file=sys.stderr)
+                outcomes.append((url, error))
+                continue
+            reply = response.json()
+            self.metrics.record_ollama("warmup", reply)
+            print(f"Warmed up {self.model} at {url} (loaded in {reply.get('load_duration', 0) / 1e9:.1f}s)", file=sys.stderr)
+            outcomes.append((url, True))
+        return outcomes
+
+    def _apply_enrichment_reply(self, domain, batch, needs, learned, reply):
+        """
+        Writes the details in an enrichment reply into the batch's relationships.
+        Returns the relationships the reply did not cover (it was truncated or unparseable).
+        """
+        if reply.get("done_reason") == "length":
+            print(f"Enrichment reply for {len(batch)} relationships was truncated", file=sys.stderr)
+        raw_response = reply.get("response", "")
+        batch_results = self.extract_json_from_text(
+            raw_response, domain, ontology_schema.ENRICHMENT_SCHEMA if self.structured_output else None
+        )
+        if isinstance(batch_results, dict) and isinstance(batch_results.get("relationships"), list):
+            batch_results = batch_results["relationships"]
+        if not isinstance(batch_results, list):
+            batch_results = []
+        # the fallback ontology (or a truncated entry) is not a usable result
+        batch_results = [result for result in batch_results if isinstance(result, dict) and "relationship_explanation" in result]
+
+        # Process and assign results back to the relationships
+        for rel, result in zip(batch, batch_results):
+            # Normalize the result structure with the new significance field
+            rel["details"] = {
+                "from_definition": result.get("from_definition", f"Definition of {rel.get('from', 'Entity')}"),
+                "to_definition": result.get("to_definition", f"Definition of {rel.get('to', 'Entity')}"),
+                "relationship_explanation": result.get("relationship_explanation", f"How {rel.get('from', 'Entity')} {rel.get('relationship', 'relates to')} {rel.get('to', 'Entity')}"),
+                "examples": result.get("examples", [f"Example of {rel.get('from', 'Entity')} {rel.get('relationship', 'relates to')} {rel.get('to', 'Entity')}"]),
+                "significance": result.get("significance", f"Significance of the relationship between {rel.get('from', 'Entity')} and {rel.get('to', 'Entity')}")
+            }
+            for side, field in (("from", "from_definition"), ("to", "to_definition")):
+                entity = str(rel.get(side, ""))
+                if entity in needs and isinstance(result.get(field), str) and result[field].strip():
+                    learned[entity] = result[field]
+
+        return batch[len(batch_results):]
+
+    def _add_default_details(self, rel):
+        """Helper method to add default details to a relationship"""
+        from_entity = rel.get("from", "Entity")
+        to_entity = rel.get("to", "Entity")
+        relationship = rel.get("relationship", "relates to")
+
+        rel["details"] = {
+            "from_definition": f"Definition of {from_entity}",
+            "to_definition": f"Definition of {to_entity}",
+            "relationship_explanation": f"How {from_entity} {relationship} {to_entity}",
+            "examples": [f"Example of {from_entity} {relationship} {to_entity}"],
+            "significance": f"Significance of the relationship between {from_entity} and {to_entity}"
+        }
+
+
+def parse_edge(text):
+    """Turns a --details argument into a fetch_details selector (an index or a from/relationship/to dict), or None if malformed."""
+    if text.strip().isdigit():
+        return int(text)
+    parts = text.split("|")
+    if len(parts) != 3:
+        return None
+    return {"from": parts[0].strip(), "relationship": parts[1].strip(), "to": parts[2].strip()}
+
+
+def run_batch(client, args):
+    """Runs --batch mode and prints the per-domain timing report as JSON."""
+    import time
+
+    domains = ontology_batch.read_domains(args.batch)
+    started = time.monotonic()
+    output = open(args.output, "a", encoding="utf-8") if args.output else None
+    try:
+        if args.async_limit:
+            async_client = ontology_async.AsyncOllamaClient(client, args.async_limit)
+            reports = ontology_batch.run_batch_async(async_client, domains, args.context, output)
+        else:
+            reports = ontology_batch.run_batch(client, domains, args.context, args.workers, output)
+    finally:
+        if output is not None:
+            output.close()
+
+    summary = ontology_batch.summarize(reports, time.monotonic() - started)
+    print(json.dumps(summary))
+    if summary["failed"]:
+        sys.exit(1)
+
+
+def main(client_class):
+    """Command line interface of a generator script; `client_class` is an OllamaClient subclass carrying its preset."""
+    import argparse
+
+    preset = client_class.preset
+    parser = argparse.ArgumentParser(description=preset.description)
+    parser.add_argument('domain', nargs='?', help='The domain for which to generate an ontology')
+    parser.add_argument('--context', '-c', type=int, default=4096, help='Context window size (default: 4096)')
+    parser.add_argument('--ollama', metavar='URLS', default='http://localhost:11434', help='Ollama server URL, or several separated by commas to balance calls across them (default: http://localhost:11434)')
+    parser.add_argument('--stages', metavar='LIST', help=f"Pipeline stages to run, comma-separated ({', '.join(STAGES)}), or changes to the defaults such as +enrich or --stages=-cache (default: {', '.join(stage for stage in STAGES if stage in preset.stages)})")
+    parser.add_argument('--serve', action='store_true', help='Run as a long-lived HTTP server instead of generating once')
+    parser.add_argument('--host', default=ontology_server.DEFAULT_HOST, help=f'Server bind address (default: {ontology_server.DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=ontology_server.DEFAULT_PORT, help=f'Server port (default: {ontology_server.DEFAULT_PORT})')
+    parser.add_argument('--cache-ttl', type=float, default=None, help='Seconds before a cached ontology expires (default: never)')
+    parser.add_argument('--cache-size', type=int, default=ontology_cache.DEFAULT_DISK_ENTRIES, help=f'Maximum ontologies kept in the disk cache (default: {ontology_cache.DEFAULT_DISK_ENTRIES})')
+    parser.add_argument('--cache-store', choices=ontology_cache.BACKENDS, default='files', help="Keep cached ontologies as one JSON file each ('files') or in one compressed database, cache/ontologies.db ('sqlite'); existing files are moved into a new database (default: files)")
+    parser.add_argument('--list-cache', action='store_true', help='Print a JSON summary of every cached ontology (domain, size, relationships) and exit')
+    parser.add_argument('--compact-cache', action='store_true', help='Remove expired cache entries (with --cache-ttl), reclaim their space and exit')
+    parser.add_argument('--similar-domains', metavar='THRESHOLD', type=float, nargs='?', const=ontology_domains.DEFAULT_SIMILARITY, help=f'Serve the cached ontology of the most similar domain name when its similarity (0-1) reaches THRESHOLD (default when given: {ontology_domains.DEFAULT_SIMILARITY})')
+    parser.add_argument('--stale-while-revalidate', action='store_true', help='With --serve, answer with an expired cached ontology (or one from an older model or prompt) at once and regenerate it in the background')
+    parser.add_argument('--prefetch', metavar='FILE', help="With --serve, generate the domains listed in FILE (one per line) in the background while the server is idle")
+    parser.add_argument('--lazy', action='store_true', help='Skip the enrich stage and return the ontology without relationship details; fetch them later with --details (also applies to --serve)')
+    parser.add_argument('--details', metavar='EDGE', nargs='*', help="Print details for relationships of the domain's ontology, fetching only missing ones; each EDGE is an index or 'FROM|RELATIONSHIP|TO' (default: all)")
+    parser.add_argument('--keep-alive', metavar='DURATION', help=f"How long Ollama keeps the model loaded between calls, e.g. 10m or -1 for ever (default: {ontology_http.LONG_RUNNING_KEEP_ALIVE} with --serve or --batch, Ollama's default otherwise)")
+    parser.add_argument('--batch', metavar='FILE', help="Generate every domain listed in FILE (one per line, '-' for stdin)")
+    parser.add_argument('--output', '-o', metavar='FILE', help='With --batch, also write each ontology as one JSON line to FILE')
+    parser.add_argument('--workers', '-w', type=int, default=1, help='With --batch, number of domains generated concurrently (default: 1)')
+    parser.add_argument('--async', dest='async_limit', type=int, metavar='N', help='With --serve or --batch, multiplex Ollama calls on one event loop with at most N in flight (needs aiohttp)')
+    parser.add_argument('--structured', action='store_true', help="Request schema-constrained JSON output from Ollama (needs Ollama 0.5+)")
+    parser.add_argument('--metrics-log', metavar='FILE', help="Write per-stage timings and Ollama token counts as JSON lines to FILE ('-' for stderr)")
+    parser.add_argument('--stream', action='store_true', help='Print each relationship as newline-delimited JSON as soon as it is generated')
+    parser.add_argument('--server', metavar='URL', help='Forward the request to a running server (e.g. http://127.0.0.1:8765), generating locally if it is unreachable')
+    parser.add_argument('--seed', metavar='DOMAIN', help="Expand the ontology of DOMAIN (cached, or generated first) with new relationships instead of generating from scratch")
+    parser.add_argument('--parallel', '-p', type=int, default=None, help='Maximum concurrent enrichment and cluster generation requests (default: $OLLAMA_NUM_PARALLEL or 1)')
+    parser.add_argument('--relationships', '-r', type=int, metavar='N', help=f'Generate about N relationships; above {ontology_hierarchy.CLUSTER_SIZE} the ontology is built from its top-level concepts, one call per concept (default: 10-15 in one call)')
+
+    args = parser.parse_args()
+
+    stages = None
+    if args.stages:
+        try:
+            stages = parse_stages(args.stages, preset.stages)
+        except ValueError as e:
+            parser.error(str(e))
+
+    metrics = None
+    if args.metrics_log:
+        metrics_stream = sys.stderr if args.metrics_log == '-' else open(args.metrics_log, "a", encoding="utf-8")
+        metrics = ontology_metrics.Metrics(metrics_stream)
+
+    # long-running modes keep the model loaded between requests; a one-shot run leaves Ollama's default
+    keep_alive = args.keep_alive
+    if keep_alive is None and (args.serve or args.batch):
+        keep_alive = ontology_http.LONG_RUNNING_KEEP_ALIVE
+
+    client_options = {"base_url": args.ollama, "max_parallel": args.parallel, "cache_ttl": args.cache_ttl, "cache_size": args.cache_size, "structured_output": args.structured, "metrics": metrics, "similarity": args.similar_domains, "stale_while_revalidate": args.stale_while_revalidate, "lazy_enrichment": args.lazy, "relationship_target": args.relationships, "cache_backend": args.cache_store, "keep_alive": keep_alive, "stages": stages}
+
+    if args.async_limit and ontology_async.aiohttp is None:
+        parser.error('--async needs aiohttp (pip install aiohttp)')
+
+    if args.list_cache or args.compact_cache:
+        cache = client_class(**client_options).cache
+        print(json.dumps(cache.compact() if args.compact_cache else cache.entries()))
+        return
+
+    if args.serve:
+        client = client_class(**client_options)
+        if args.prefetch:
+            for domain in ontology_batch.read_domains(args.prefetch):
+                client.prefetcher.prefetch(domain, args.context)
+        if args.async_limit:
+            client = ontology_async.ThreadedAsyncClient(ontology_async.AsyncOllamaClient(client, args.async_limit))
+        ontology_server.serve(client, args.host, args.port, args.context)
+        return
+
+    if args.batch:
+        run_batch(client_class(**client_options), args)
+        return
+
+    if not args.domain:
+        parser.error('domain is required unless --serve or --batch is given')
+
+    if args.details is not None:
+        selectors = [parse_edge(edge) for edge in args.details] or None
+        if selectors is not None and None in selectors:
+            parser.error("each --details EDGE must be an index or 'FROM|RELATIONSHIP|TO'")
+        result = None
+        if args.server:
+            result = ontology_server.request_details(args.server, args.domain, selectors, args.context)
+        if result is None:
+            result = client_class(**client_options).fetch_details(args.domain, selectors, args.context)
+        print(json.dumps(result))
+        return
+
+    if args.stream:
+        emitted = 0
+        for rel in client_class(**client_options).stream_relationships(args.domain, args.context):
+            print(json.dumps(rel), flush=True)
+            emitted += 1
+        if emitted == 0:
+            print(json.dumps({"error": "Cannot connect to Ollama service", "domain": args.domain, "relationships": []}))
+        return
+
+    try:
+        ontology = None
+        if args.server:
+            ontology = ontology_server.request_ontology(args.server, args.domain, args.context, seed=args.seed)
+
+        if ontology is None:
+            client = client_class(**client_options)
+            ontology = client.generate_ontology(args.domain, args.context, seed=args.seed)
+
+        if isinstance(ontology, dict) and "domain" in ontology and not isinstance(ontology["domain"], str):
+            ontology["domain"] = str(args.domain)
+
+        print(json.dumps(ontology))
+    except Exception as e:
+        print(json.dumps({
+            "error": f"Error: {str(e)}",
+            "domain": args.domain,
+            "relationships": []
+        }))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Background regeneration of cached ontologies.
+
+In stale-while-revalidate mode the client answers a request whose cache
+entry has expired (or was written by an older model or prompt version) with
+the stale ontology at once and queues the domain here for regeneration, so
+users keep cache-hit latency while entries rotate.
+
+The same queue warms domains ahead of demand: ones listed up front
+(--prefetch FILE or POST /prefetch) and the most requested domains of the
+running server whose entries are missing or expired. Jobs only start while
+this process has no other Ollama call in flight, so prefetching uses idle
+capacity instead of competing with user requests.
+"""
+import heapq
+import itertools
+import sys
+import threading
+import time
+import traceback
+
+# Queue priorities; lower runs first
+REVALIDATE = 0
+PREFETCH = 1
+
+# Seconds without any Ollama call in flight before a queued job starts
+DEFAULT_IDLE_WAIT = 2.0
+# Seconds between scans of the most requested domains for missing or expired entries
+DEFAULT_SWEEP_INTERVAL = 300
+# Number of most requested domains each scan considers
+DEFAULT_POPULAR = 20
+
+_POLL_INTERVAL = 0.25
+
+
+class Prefetcher:
+
+    def __init__(self, client, idle_wait=DEFAULT_IDLE_WAIT, sweep_interval=DEFAULT_SWEEP_INTERVAL,
+                 popular=DEFAULT_POPULAR):
+        self.client = client                # synchronous OllamaClient
+        self.idle_wait = idle_wait
+        self.sweep_interval = sweep_interval
+        self.popular = popular
+        self.queue = []                     # heap of (priority, sequence, cache key)
+        self.jobs = {}                      # cache key -> (priority, domain, num_ctx)
+        self.requests = {}                  # cache key -> [count, domain, num_ctx]
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = None                 # cache key of the job being generated
+        self.next_sweep = time.monotonic() + sweep_interval
+        self.counters = {"revalidations": 0, "prefetches": 0, "failures": 0}
+
+    def start(self):
+        """Starts the worker thread if it is not running yet."""
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="ontology-prefetch", daemon=True)
+                self.thread.start()
+
+    def record(self, domain, num_ctx):
+        """Counts a request for a domain; the most requested ones are kept warm."""
+        key = self.client.cache_key(domain, num_ctx)
+        with self.condition:
+            entry = self.requests.get(key)
+            if entry is None:
+                self.requests[key] = [1, domain, num_ctx]
+            else:
+                entry[0] += 1
+
+    def _enqueue(self, priority, domain, num_ctx):
+        key = self.client.cache_key(domain, num_ctx)
+        with self.condition:
+            queued = self.jobs.get(key)
+            if key == self.running or (queued is not None and queued[0] <= priority):
+                return False
+            # a stale heap entry left behind by a priority upgrade is skipped when popped
+            self.jobs[key] = (priority, domain, num_ctx)
+            heapq.heappush(self.queue, (priority, next(self.sequence), key))
+            self.condition.notify()
+        self.start()
+        return True
+
+    def revalidate(self, domain, num_ctx):
+        """Queues a regeneration of a domain whose stale ontology was just served."""
+        return self._enqueue(REVALIDATE, domain, num_ctx)
+
+    def prefetch(self, domain, num_ctx):
+        """Queues a domain to be generated during an idle period unless it is cached by then."""
+        return self._enqueue(PREFETCH, domain, num_ctx)
+
+    def _next_job(self):
+        """Waits for the next job, sweeping the popular domains whenever a sweep is due."""
+        with self.condition:
+            while True:
+                if time.monotonic() >= self.next_sweep:
+                    self._sweep()
+                    self.next_sweep = time.monotonic() + self.sweep_interval
+                while self.queue:
+                    priority, _, key = heapq.heappop(self.queue)
+                    job = self.jobs.get(key)
+                    if job is not None and job[0] == priority:
+                        del self.jobs[key]
+                        self.running = key
+                        return job
+                self.condition.wait(max(0.0, self.next_sweep - time.monotonic()))
+
+    def _sweep(self):
+        """Queues the most requested domains that are not freshly cached (condition held)."""
+        popular = sorted(self.requests.items(), key=lambda item: -item[1][0])[:self.popular]
+        # Halve the counts so recent requests weigh more than old ones
+        for key in list(self.requests):
+            self.requests[key][0] //= 2
+            if not self.requests[key][0]:
+                del self.requests[key]
+        for key, (count, domain, num_ctx) in popular:
+            if key not in self.jobs and not self.client.cache.contains(key):
+                self.jobs[key] = (PREFETCH, domain, num_ctx)
+                heapq.heappush(self.queue, (PREFETCH, next(self.sequence), key))
+
+    def _wait_until_idle(self):
+        idle_since = None
+        while True:
+            if self.client.endpoints.outstanding():
+                idle_since = None
+            elif idle_since is None:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since >= self.idle_wait:
+                return
+            time.sleep(_POLL_INTERVAL)
+
+    def _run(self):
+        while True:
+            priority, domain, num_ctx = self._next_job()
+            self._wait_until_idle()
+            if priority == PREFETCH and self.client.cache.contains(self.client.cache_key(domain, num_ctx)):
+                with self.condition:
+                    self.running = None
+                continue
+            kind = "Regenerating stale" if priority == REVALIDATE else "Prefetching"
+            print(f"{kind} ontology for '{domain}' in the background", file=sys.stderr)
+            try:
+                ontology = self.client.refresh_ontology(domain, num_ctx)
+                failed = not isinstance(ontology, dict) or "error" in ontology
+            except Exception as e:
+                print(f"Error regenerating ontology in the background: {str(e)}", file=sys.stderr)
+                traceback.print_exc(file=sys.stderr)
+                failed = True
+            with self.condition:
+                self.running = None
+                self.counters["failures" if failed else "revalidations" if priority == REVALIDATE else "prefetches"] += 1
+
+    def stats(self):
+        with self.condition:
+            stats = dict(self.counters)
+            stats["queued"] = len(self.jobs)
+            stats["tracked_domains"] = len(self.requests)
+        return stats
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+JSON schemas for Ollama's structured-output mode ("format" parameter), a
+single-pass stripper for reasoning blocks, and a small validator covering
+the subset of JSON Schema these schemas use.
+"""
+import re
+
+CARDINALITIES = ["1", "0..1", "0..*", "*", "1..*"]
+CATEGORIES = ["is-a", "part-of", "has", "performs", "associates-with"]
+
+# Ontology with plain directed relationships (Linux/WSL variant)
+SIMPLE_ONTOLOGY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "domain": {"type": "string"},
+        "relationships": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "from": {"type": "string"},
+                    "to": {"type": "string"},
+                    "relationship": {"type": "string"}
+                },
+                "required": ["from", "to", "relationship"]
+            }
+        }
+    },
+    "required": ["domain", "relationships"]
+}
+
+# Ontology with cardinality and category on every relationship (Windows variant)
+ONTOLOGY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "domain": {"type": "string"},
+        "relationships": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "from": {"type": "string"},
+                    "to": {"type": "string"},
+                    "relationship": {"type": "string"},
+                    "fromCardinality": {"type": "string", "enum": CARDINALITIES},
+                    "toCardinality": {"type": "string", "enum": CARDINALITIES},
+                    "category": {"type": "string", "enum": CATEGORIES}
+                },
+                "required": ["from", "to", "relationship", "fromCardinality", "toCardinality", "category"]
+            }
+        }
+    },
+    "required": ["domain", "relationships"]
+}
+
+# Enrichment details; structured output must be an object, so the per-relationship
+# entries are wrapped in a "relationships" array
+ENRICHMENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "relationships": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "relationship": {"type": "string"},
+                    "from_definition": {"type": "string"},
+                    "to_definition": {"type": "string"},
+                    "relationship_explanation": {"type": "string"},
+                    "examples": {"type": "array", "items": {"type": "string"}},
+                    "significance": {"type": "string"}
+                },
+                # definitions are only requested for entities without a stored one
+                "required": ["relationship", "relationship_explanation", "examples", "significance"]
+            }
+        }
+    },
+    "required": ["relationships"]
+}
+
+# Definitions asked for again after the enrichment batch that should have given them failed
+DEFINITIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "definitions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "entity": {"type": "string"},
+                    "definition": {"type": "string"}
+                },
+                "required": ["entity", "definition"]
+            }
+        }
+    },
+    "required": ["definitions"]
+}
+
+# Top-level concepts of a domain and the relationships between them (hierarchical generation)
+CONCEPTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "domain": {"type": "string"},
+        "concepts": {"type": "array", "minItems": 1, "items": {"type": "string"}},
+        "relationships": SIMPLE_ONTOLOGY_SCHEMA["properties"]["relationships"]
+    },
+    "required": ["domain", "concepts", "relationships"]
+}
+
+_REASONING_BLOCK = re.compile(r"<think>.*?</think>", re.DOTALL)
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "number": (int, float),
+    "integer": int
+}
+
+
+def strip_reasoning(text):
+    """Removes <think>...</think> reasoning blocks (e.g. from deepseek-r1) in one pass."""
+    if "<think>" not in text:
+        return text
+    return _REASONING_BLOCK.sub("", text).strip()
+
+
+def validate(instance, schema, path="$"):
+    """
+    Checks an instance against a schema using type, properties, required,
+    items, enum and minItems. Returns a list of error messages (empty if valid).
+    """
+    errors = []
+    expected = schema.get("type")
+    if expected is not None and not isinstance(instance, _TYPES[expected]):
+        return [f"{path}: expected {expected}, got {type(instance).__name__}"]
+
+    if "enum" in schema and instance not in schema["enum"]:
+        errors.append(f"{path}: {instance!r} is not one of {schema['enum']}")
+
+    if isinstance(instance, dict):
+        for name in schema.get("required", []):
+            if name not in instance:
+                errors.append(f"{path}: missing required property '{name}'")
+        for name, subschema in schema.get("properties", {}).items():
+            if name in instance:
+                errors.extend(validate(instance[name], subschema, f"{path}.{name}"))
+
+    if isinstance(instance, list):
+        if len(instance) < schema.get("minItems", 0):
+            errors.append(f"{path}: expected at least {schema['minItems']} items")
+        if "items" in schema:
+            for i, item in enumerate(instance):
+                errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+
+    return errors
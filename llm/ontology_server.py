@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Long-running HTTP front end for OllamaClient.
+
+Keeps a single client (and its HTTP connections and caches) alive between
+requests so callers such as the WordPress plugin do not pay interpreter
+startup and a cold Ollama connection on every page hit.
+"""
+import json
+import sys
+import threading
+import traceback
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ontology_store
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+def make_handler(client, default_ctx=4096):
+    """Build a request handler class bound to an already constructed client."""
+
+    class OntologyRequestHandler(BaseHTTPRequestHandler):
+        server_version = "OntologyGenerator/1.0"
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length", 0) or 0)
+            if length <= 0:
+                return {}
+            return json.loads(self.rfile.read(length).decode("utf-8"))
+
+        def _read_context(self, request):
+            # "context" is the Ollama num_ctx: a positive integer (or its decimal string)
+            value = request.get("context", default_ctx)
+            if isinstance(value, bool) or not isinstance(value, (int, str)):
+                raise ValueError("Context must be an integer")
+            try:
+                num_ctx = int(value)
+            except ValueError:
+                raise ValueError("Context must be an integer")
+            if num_ctx <= 0:
+                raise ValueError("Context must be positive")
+            return num_ctx
+
+        def _send_text(self, status, text, content_type="text/plain; version=0.0.4"):
+            body = text.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            path = url.path.rstrip("/")
+            if path == "/ontologies" and getattr(client, "cache", None) is not None:
+                self._list_ontologies(urllib.parse.parse_qs(url.query))
+            elif path == "/metrics" and getattr(client, "metrics", None) is not None:
+                extra = {}
+                if getattr(client, "cache", None) is not None:
+                    for name, value in client.cache.stats().items():
+                        extra[f"ontology_cache_{name}"] = value
+                if getattr(client, "prefetcher", None) is not None:
+                    for name, value in client.prefetcher.stats().items():
+                        extra[f"ontology_prefetch_{name}"] = value
+                text = client.metrics.to_prometheus(extra)
+                if getattr(client, "endpoints", None) is not None:
+                    text += client.endpoints.to_prometheus()
+                self._send_text(200, text)
+            elif path == "/health":
+                health = {"status": "ok"}
+                if getattr(client, "cache", None) is not None:
+                    health["cache"] = client.cache.stats()
+                if getattr(client, "endpoints", None) is not None:
+                    health["endpoints"] = client.endpoints.stats()
+                if getattr(client, "prefetcher", None) is not None:
+                    health["prefetch"] = client.prefetcher.stats()
+                self._send_json(200, health)
+            else:
+                self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+        def do_POST(self):
+            path = urllib.parse.urlsplit(self.path).path.rstrip("/")
+            if path not in ("/generate", "/stream", "/prefetch", "/details"):
+                self._send_json(404, {"error": f"Unknown path: {self.path}"})
+                return
+
+            try:
+                request = self._read_json()
+                if not isinstance(request, dict):
+                    raise ValueError("expected a JSON object")
+            except (ValueError, UnicodeDecodeError) as e:
+                self._send_json(400, {"error": f"Invalid JSON body: {str(e)}"})
+                return
+            try:
+                num_ctx = self._read_context(request)
+            except ValueError as e:
+                self._send_json(400, {"error": str(e), "relationships": []})
+                return
+
+            if path == "/prefetch":
+                self._queue_prefetch(request, num_ctx)
+                return
+
+            domain = str(request.get("domain", "")).strip()
+            if not domain:
+                self._send_json(400, {"error": "Domain is required", "relationships": []})
+                return
+
+            if path == "/stream":
+                self._stream_relationships(domain, num_ctx)
+                return
+
+            if path == "/details":
+                self._send_details(domain, request, num_ctx)
+                return
+
+            try:
+                seed = request.get("seed") or None
+                # {"details": false} asks for the graph only; a cached one is read without its details
+                graph_only = request.get("details", True) is False and seed is None
+                ontology = client.cache.get_graph(client.cache_key(domain, num_ctx)) if graph_only else None
+                if ontology is None:
+                    ontology = client.generate_ontology(domain, num_ctx, seed=seed)
+                    if graph_only and isinstance(ontology, dict):
+                        ontology = ontology_store.split_details(ontology)[0]
+                if isinstance(ontology, dict) and "domain" in ontology and not isinstance(ontology["domain"], str):
+                    ontology["domain"] = domain
+                self._send_json(200, ontology)
+            except Exception as e:
+                print(f"Error serving ontology request: {str(e)}", file=sys.stderr)
+                traceback.print_exc(file=sys.stderr)
+                self._send_json(500, {"error": f"Error: {str(e)}", "domain": domain, "relationships": []})
+
+        def _list_ontologies(self, query):
+            # GET /ontologies?prefix=&limit=&offset=; one summary per cached ontology, most recently used first
+            try:
+                limit = int(query["limit"][0]) if "limit" in query else None
+                offset = int(query.get("offset", ["0"])[0])
+            except ValueError:
+                self._send_json(400, {"error": "Limit and offset must be integers"})
+                return
+            entries = client.cache.entries(query.get("prefix", [None])[0], limit, offset)
+            self._send_json(200, {"ontologies": entries})
+
+        def _queue_prefetch(self, request, num_ctx):
+            # {"domains": [...], "context": n}; generation happens later, while the server is idle
+            if getattr(client, "prefetcher", None) is None:
+                self._send_json(404, {"error": "Prefetching is not available"})
+                return
+            domains = request.get("domains")
+            if not isinstance(domains, list) or not domains:
+                self._send_json(400, {"error": "A non-empty list of domains is required"})
+                return
+            queued = sum(1 for domain in domains if str(domain).strip() and client.prefetcher.prefetch(str(domain).strip(), num_ctx))
+            self._send_json(202, {"queued": queued})
+
+        def _send_details(self, domain, request, num_ctx):
+            # {"domain", "context", "relationships": [index or {"from", "relationship", "to"}, ...]}
+            if not hasattr(client, "fetch_details"):
+                self._send_json(404, {"error": "Relationship details are not available", "domain": domain, "relationships": []})
+                return
+            selectors = request.get("relationships")
+            if selectors is not None and not isinstance(selectors, list):
+                self._send_json(400, {"error": "Relationships must be a list", "domain": domain, "relationships": []})
+                return
+            try:
+                self._send_json(200, client.fetch_details(domain, selectors, num_ctx))
+            except Exception as e:
+                print(f"Error fetching relationship details: {str(e)}", file=sys.stderr)
+                traceback.print_exc(file=sys.stderr)
+                self._send_json(500, {"error": f"Error: {str(e)}", "domain": domain, "relationships": []})
+
+        def _stream_relationships(self, domain, num_ctx):
+            # Newline-delimited JSON, one relationship per line; the connection
+            # is closed at the end, so no Content-Length is needed
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for rel in client.stream_relationships(domain, num_ctx):
+                    self.wfile.write((json.dumps(rel) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+            except Exception as e:
+                print(f"Error streaming ontology: {str(e)}", file=sys.stderr)
+                self.wfile.write((json.dumps({"error": f"Error: {str(e)}", "domain": domain}) + "\n").encode("utf-8"))
+
+        def log_message(self, format, *args):
+            print(f"[server] {self.address_string()} {format % args}", file=sys.stderr)
+
+    return OntologyRequestHandler
+
+
+def serve(client, host=DEFAULT_HOST, port=DEFAULT_PORT, default_ctx=4096):
+    """Serve ontology generation requests until interrupted."""
+    httpd = ThreadingHTTPServer((host, port), make_handler(client, default_ctx))
+    httpd.daemon_threads = True
+    if getattr(client, "prefetcher", None) is not None:
+        # keeps the most requested domains warm (see ontology_prefetch)
+        client.prefetcher.start()
+    if hasattr(client, "warm_up"):
+        # load the model (and evaluate the fixed enrichment prompt) before the first request needs it
+        threading.Thread(target=client.warm_up, args=(default_ctx,), name="ontology-warmup", daemon=True).start()
+    print(f"Ontology generator listening on http://{host}:{port}", file=sys.stderr)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down ontology generator server", file=sys.stderr)
+    finally:
+        httpd.server_close()
+
+
+def request_ontology(server_url, domain, num_ctx=4096, timeout=300, seed=None):
+    """
+    Ask a running server for an ontology (expanded from `seed` if given).
+    Returns the decoded ontology, or None if the server cannot be reached.
+    """
+    payload = {"domain": domain, "context": num_ctx}
+    if seed:
+        payload["seed"] = seed
+    return _post_json(server_url, "/generate", payload, timeout)
+
+
+def request_details(server_url, domain, relationships=None, num_ctx=4096, timeout=300):
+    """
+    Ask a running server for the details of some relationships of a domain
+    (see OllamaClient.fetch_details). Returns the decoded reply, or None if
+    the server cannot be reached.
+    """
+    payload = {"domain": domain, "context": num_ctx}
+    if relationships is not None:
+        payload["relationships"] = relationships
+    return _post_json(server_url, "/details", payload, timeout)
+
+
+def _post_json(server_url, path, payload, timeout):
+    """POSTs a JSON request to the server; returns the decoded reply, or None if it cannot be reached."""
+    domain = payload["domain"]
+    body = json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(
+        f"{server_url.rstrip('/')}{path}",
+        data=body,
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        # The server answered; pass its JSON error payload through if it has one
+        try:
+            return json.loads(e.read().decode("utf-8"))
+        except ValueError:
+            return {"error": f"Server error {e.code}", "domain": domain, "relationships": []}
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        print(f"Error contacting ontology server at {server_url}: {str(e)}", file=sys.stderr)
+        return None
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Single-file disk tier for the ontology cache.
+
+With tens of thousands of cached domains, a directory of JSON files is slow
+to scan for eviction and listing, and every read parses the whole ontology,
+details included. OntologyStore keeps the same entries in one SQLite
+database instead:
+
+- each ontology is stored as two zlib-compressed JSON blobs, the graph
+  (domain and relationships without details) and the per-relationship
+  details, so graph-only reads never decompress the details;
+- key, domain, timestamps and sizes are columns, with key and last use
+  indexed, so lookup by key, listing and least-recently-used eviction are
+  queries instead of file scans;
+- the database runs in WAL mode with memory-mapped reads, so readers in
+  several processes never block each other or a writer;
+- compact() drops expired entries and rewrites the file to reclaim space.
+
+sqlite3 ships with Python; nothing needs to be installed.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_FILENAME = "ontologies.db"
+# Bytes of the database file mapped into memory for reads
+MMAP_SIZE = 256 * 1024 * 1024
+BUSY_TIMEOUT = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    domain TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    relationships INTEGER NOT NULL,
+    detailed INTEGER NOT NULL,
+    graph BLOB NOT NULL,
+    details BLOB
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS latest (
+    scope TEXT PRIMARY KEY,
+    key TEXT NOT NULL
+);
+"""
+
+
+def _pack(data):
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def split_details(ontology):
+    """
+    Splits an ontology into its graph (relationships without "details") and
+    the list of per-relationship details (None where a relationship has none).
+    """
+    relationships = ontology.get("relationships") if isinstance(ontology, dict) else None
+    if not isinstance(relationships, list):
+        return ontology, []
+    graph = dict(ontology)
+    graph["relationships"] = []
+    details = []
+    for rel in relationships:
+        if isinstance(rel, dict) and "details" in rel:
+            details.append(rel["details"])
+            rel = {name: value for name, value in rel.items() if name != "details"}
+        else:
+            details.append(None)
+        graph["relationships"].append(rel)
+    return graph, details
+
+
+def join_details(graph, details):
+    """Inverse of split_details; changes and returns `graph`."""
+    for rel, entry in zip(graph.get("relationships", []), details):
+        if entry is not None and isinstance(rel, dict):
+            rel["details"] = entry
+    return graph
+
+
+class OntologyStore:
+    """
+    Cache entries ({"key", "created", "ontology"} envelopes, as in the JSON
+    files of OntologyCache) in one SQLite database. Safe to share between
+    threads; every thread gets its own connection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            self.local.connection = connection
+        return connection
+
+    def get(self, key, details=True):
+        """
+        Returns the envelope stored for a key, or None. With details=False
+        only the graph is read and decompressed.
+        """
+        columns = "created, graph, details" if details else "created, graph"
+        row = self._connect().execute(f"SELECT {columns} FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        ontology = _unpack(row[1])
+        if details and row[2] is not None:
+            join_details(ontology, _unpack(row[2]))
+        return {"key": key, "created": row[0], "ontology": ontology}
+
+    def created(self, key):
+        """Creation time of the entry for a key, or None; reads no ontology."""
+        row = self._connect().execute("SELECT created FROM entries WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, key, created, ontology, scope=None):
+        """Stores an ontology; `scope` names the latest-entry pointer to move to this key."""
+        graph, details = split_details(ontology)
+        detailed = sum(1 for entry in details if entry is not None)
+        relationships = graph.get("relationships") if isinstance(graph, dict) else None
+        domain = graph.get("domain") if isinstance(graph, dict) else None
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, domain, created, accessed, relationships, detailed, graph, details) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, str(domain or ""), created, time.time(), len(relationships) if isinstance(relationships, list) else 0,
+                 detailed, _pack(graph), _pack(details) if detailed else None)
+            )
+            if scope is not None:
+                connection.execute("INSERT OR REPLACE INTO latest (scope, key) VALUES (?, ?)", (scope, key))
+
+    def touch(self, key):
+        """Marks an entry as used now, for least-recently-used eviction."""
+        self._connect().execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def latest(self, scope):
+        """Key last stored under a scope, or None."""
+        row = self._connect().execute("SELECT key FROM latest WHERE scope = ?", (scope,)).fetchone()
+        return row[0] if row is not None else None
+
+    def forget_latest(self, scope):
+        self._connect().execute("DELETE FROM latest WHERE scope = ?", (scope,))
+
+    def keys(self):
+        return [row[0] for row in self._connect().execute("SELECT key FROM entries")]
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def entries(self, prefix=None, limit=None, offset=0):
+        """
+        Lists the stored entries, most recently used first, without reading
+        any ontology: key, domain, created, accessed, number of relationships,
+        number with details, and compressed size in bytes.
+        """
+        query = ("SELECT key, domain, created, accessed, relationships, detailed, "
+                 "LENGTH(graph) + COALESCE(LENGTH(details), 0) FROM entries")
+        parameters = []
+        if prefix:
+            # keys are "model|prompt|context|domain"; match on a prefix of that
+            query += " WHERE substr(key, 1, ?) = ?"
+            parameters += [len(prefix), prefix]
+        query += " ORDER BY accessed DESC LIMIT ? OFFSET ?"
+        parameters += [-1 if limit is None else limit, offset]
+        names = ("key", "domain", "created", "accessed", "relationships", "detailed", "bytes")
+        return [dict(zip(names, row)) for row in self._connect().execute(query, parameters)]
+
+    def evict(self, max_entries):
+        """Deletes the least recently used entries beyond `max_entries`; returns how many."""
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            cursor = connection.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (max_entries,)
+            )
+        return cursor.rowcount
+
+    def compact(self, expired_before=None):
+        """
+        Deletes entries created before `expired_before` (a timestamp) and
+        pointers to missing entries, then rewrites the database file to
+        reclaim their space. Returns the entries removed and file sizes.
+        """
+        size_before = self._size()
+        connection = self._connect()
+        removed = 0
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            if expired_before is not None:
+                removed = connection.execute("DELETE FROM entries WHERE created < ?", (expired_before,)).rowcount
+            connection.execute("DELETE FROM latest WHERE key NOT IN (SELECT key FROM entries)")
+        connection.execute("VACUUM")
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return {"removed": removed, "entries": self.count(), "bytes_before": size_before, "bytes_after": self._size()}
+
+    def _size(self):
+        """Bytes on disk, write-ahead log included."""
+        size = 0
+        for path in (self.path, self.path + "-wal"):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def close(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
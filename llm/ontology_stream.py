@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Helpers for consuming Ollama's streaming (NDJSON) generate API and pulling
+relationship objects out of the partial JSON as soon as each one is complete.
+"""
+import json
+
+
+def iter_response_text(response):
+    """
+    Yields the text fragments from a streaming /api/generate response.
+    The final chunk (with "done": true and Ollama's timing fields) is
+    stored on the response as `final_chunk` for callers that want it.
+    """
+    response.final_chunk = None
+    for line in response.iter_lines():
+        if not line:
+            continue
+        chunk = json.loads(line)
+        if chunk.get("error"):
+            raise Exception(f"Ollama stream error: {chunk['error']}")
+        if chunk.get("response"):
+            yield chunk["response"]
+        if chunk.get("done"):
+            response.final_chunk = chunk
+            break
+
+
+class RelationshipStreamParser:
+    """
+    Incremental scanner that finds complete relationship objects in a
+    growing JSON document.
+
+    Text is fed in arbitrary fragments. The scanner tracks string/escape state
+    and the stack of open objects and arrays, and whenever an object that sits
+    directly inside an array closes it is decoded; objects carrying "from",
+    "to" and "relationship" keys are returned. Reasoning blocks such as
+    deepseek-r1's <think>...</think> preamble are skipped before scanning.
+    Scanned text is dropped unless it belongs to an object that may still
+    be decoded, so each character is scanned once and the kept text stays
+    about one relationship long.
+    """
+
+    REASONING_OPEN = "<think>"
+    REASONING_CLOSE = "</think>"
+
+    def __init__(self):
+        self.buffer = ""
+        self.text = ""          # unscanned text and any object still open inside an array
+        self.offset = 0         # index of self.text[0] in everything fed so far, minus any reasoning block
+        self.position = 0       # next index of self.text to scan
+        self.in_string = False
+        self.escaped = False
+        self.stack = []         # entries of (char, start index in everything fed so far)
+        self.reasoning_done = False
+
+    def feed(self, fragment):
+        """Adds a fragment of model output and returns any relationships it completed."""
+        if not self.reasoning_done:
+            self.buffer += fragment
+            stripped = self.buffer.lstrip()
+            if stripped.startswith(self.REASONING_OPEN):
+                end = stripped.find(self.REASONING_CLOSE)
+                if end < 0:
+                    return []
+                fragment = stripped[end + len(self.REASONING_CLOSE):]
+            elif len(stripped) < len(self.REASONING_OPEN) and self.REASONING_OPEN.startswith(stripped):
+                # could still turn into a reasoning block; wait for more text
+                return []
+            else:
+                fragment = self.buffer
+            self.buffer = ""
+            self.reasoning_done = True
+
+        self.text += fragment
+        return self._scan()
+
+    def _scan(self):
+        completed = []
+        text = self.text
+        for i in range(self.position, len(text)):
+            ch = text[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+
+            if ch == '"':
+                # strings only matter once we are inside a JSON value
+                if self.stack:
+                    self.in_string = True
+            elif ch in "{[":
+                self.stack.append((ch, self.offset + i))
+            elif ch in "}]" and self.stack:
+                opener, start = self.stack.pop()
+                if ch == "}" and opener == "{" and self.stack and self.stack[-1][0] == "[":
+                    rel = self._decode(text[start - self.offset:i + 1])
+                    if rel is not None:
+                        completed.append(rel)
+
+        # Only objects directly inside an array are ever decoded; keep the
+        # text from the oldest one still open and drop the rest
+        keep = self.offset + len(text)
+        for depth in range(1, len(self.stack)):
+            if self.stack[depth][0] == "{" and self.stack[depth - 1][0] == "[":
+                keep = self.stack[depth][1]
+                break
+        self.text = text[keep - self.offset:]
+        self.offset = keep
+        self.position = len(self.text)
+        return completed
+
+    def _decode(self, candidate):
+        try:
+            obj = json.loads(candidate)
+        except json.JSONDecodeError:
+            return None
+        if isinstance(obj, dict) and "from" in obj and "to" in obj and "relationship" in obj:
+            return obj
+        return None
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Token budgeting for batched enrichment prompts.
+
+Token counts are estimated at about four characters per token, which is
+close enough for English text to size batches without loading a tokenizer.
+pack_batches() fills each call up to the context window, and
+AdaptiveBatchSize lowers the batch limit when replies come back truncated or
+unparseable and slowly raises it again while calls succeed.
+"""
+import threading
+
+CHARS_PER_TOKEN = 4
+# Share of the context window batches are packed to, leaving room for estimation error
+CONTEXT_FILL = 0.85
+MAX_BATCH_SIZE = 16
+
+
+def estimate_tokens(text):
+    """Rough token count of a piece of text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack_batches(items, costs, budget, max_items=MAX_BATCH_SIZE):
+    """
+    Splits `items` into consecutive batches whose summed `costs` stay within
+    `budget` and that hold at most `max_items` items. An item that is too
+    large on its own still gets a batch of its own.
+    """
+    batches = []
+    batch = []
+    used = 0
+    for item, cost in zip(items, costs):
+        if batch and (used + cost > budget or len(batch) >= max_items):
+            batches.append(batch)
+            batch = []
+            used = 0
+        batch.append(item)
+        used += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class AdaptiveBatchSize:
+    """
+    Upper bound on the number of items per batch: halved (from the size of
+    the failing batch) whenever a batch has to be retried, and raised by one
+    after a run in which every batch succeeded.
+    """
+
+    def __init__(self, maximum=MAX_BATCH_SIZE):
+        self.maximum = maximum
+        self.limit = maximum
+        self.lock = threading.Lock()
+
+    def shrink(self, failed_size):
+        with self.lock:
+            self.limit = max(1, min(self.limit, failed_size // 2))
+            return self.limit
+
+    def grow(self):
+        with self.lock:
+            self.limit = min(self.maximum, self.limit + 1)
+            return self.limit
@@ -0,0 +1,52 @@
+"""Tests for ontology_domains: plural folding shared by entity and domain keys."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "llm"))
+
+import ontology_domains
+
+
+@pytest.mark.parametrize("plural, expected", [
+    ("movies", "movie"),
+    ("cookies", "cookie"),
+    ("ties", "tie"),
+    ("companies", "company"),
+    ("buses", "bus"),
+    ("statuses", "status"),
+    ("classes", "class"),
+    ("houses", "house"),
+    ("caches", "cache"),
+    ("churches", "church"),
+    ("boxes", "box"),
+    ("sizes", "size"),
+    ("users", "user"),
+])
+def test_singular_folds_plurals(plural, expected):
+    assert ontology_domains.singular(plural) == expected
+
+
+@pytest.mark.parametrize("word", ["news", "series", "physics", "movie", "bus", "status", "class"])
+def test_singular_keeps_words_that_are_not_plurals(word):
+    assert ontology_domains.singular(word) == word
+
+
+@pytest.mark.parametrize("spellings", [
+    ("Movies", "movie", " MOVIE "),
+    ("Bus routes", "Buses route", "bus-route"),
+    ("Health Care", "healthcare", "Health Cares"),
+    ("Cookies", "cookie"),
+])
+def test_domain_key_folds_spellings_of_one_domain(spellings):
+    assert len({ontology_domains.domain_key(spelling) for spelling in spellings}) == 1
+
+
+@pytest.mark.parametrize("domains", [
+    ("C++ programming", "C# programming", "C programming"),
+    ("日本 history", "中国 history"),
+    ("News", "New"),
+])
+def test_domain_key_keeps_distinct_domains_apart(domains):
+    assert len({ontology_domains.domain_key(domain) for domain in domains}) == len(domains)
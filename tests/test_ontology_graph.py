@@ -0,0 +1,42 @@
+"""Tests for ontology_graph: the compact Ontology and relationship identity."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "llm"))
+
+import ontology_graph
+
+
+def test_malformed_cardinality_and_category_fall_back_to_defaults():
+    ontology = ontology_graph.Ontology.from_dict({"domain": "Library", "relationships": [
+        {"from": "Member", "relationship": "borrows", "to": "Book",
+         "fromCardinality": ["1", "*"], "toCardinality": {"min": 0}, "category": ["has"]},
+    ]})
+    rel = ontology.to_dict()["relationships"][0]
+    assert rel["fromCardinality"] == ontology_graph.DEFAULT_CARDINALITY
+    assert rel["toCardinality"] == ontology_graph.DEFAULT_CARDINALITY
+    assert rel["category"] == ontology_graph.DEFAULT_CATEGORY
+
+
+def test_plural_aliases_share_a_name_key():
+    assert ontology_graph.name_key("Movies") == ontology_graph.name_key("Movie")
+    assert ontology_graph.name_key("Buses") == ontology_graph.name_key("Bus")
+    assert ontology_graph.name_key("C++") != ontology_graph.name_key("C#")
+
+
+def test_canonicalize_merges_plural_aliases():
+    relationships, renamed, removed = ontology_graph.canonicalize([
+        {"from": "Studio", "relationship": "produces", "to": "Movie"},
+        {"from": "Studio", "relationship": "produces", "to": "Movies"},
+        {"from": "Movies", "relationship": "features", "to": "Actor"},
+    ])
+    # the most frequent spelling wins
+    assert [(rel["from"], rel["to"]) for rel in relationships] == [("Studio", "Movies"), ("Movies", "Actor")]
+    assert (renamed, removed) == (1, 1)
+
+
+def test_known_cardinality_and_category_are_kept():
+    ontology = ontology_graph.Ontology()
+    ontology.add("Member", "Book", "borrows", "0..*", "1..*", "has")
+    rel = ontology.to_dict()["relationships"][0]
+    assert (rel["fromCardinality"], rel["toCardinality"], rel["category"]) == ("0..*", "1..*", "has")
@@ -476,6 +476,27 @@ function ontology_visualizer_enqueue_scripts() {
 add_action('wp_enqueue_scripts', 'ontology_visualizer_enqueue_scripts');
 
 
+// Ask a running generator daemon (ontology_generator.py --serve) for an ontology.
+// Enable by defining ONTOLOGY_GENERATOR_SERVER_URL in wp-config.php, e.g. 'http://127.0.0.1:8765'.
+// Returns the raw JSON body, or null so the caller can fall back to running the script.
+function ontology_visualizer_request_server($domain) {
+    if (!defined('ONTOLOGY_GENERATOR_SERVER_URL') || !ONTOLOGY_GENERATOR_SERVER_URL) {
+        return null;
+    }
+    
+    $response = wp_remote_post(trailingslashit(ONTOLOGY_GENERATOR_SERVER_URL) . 'generate', array(
+        'timeout' => 300,
+        'headers' => array('Content-Type' => 'application/json'),
+        'body'    => wp_json_encode(array('domain' => $domain)),
+    ));
+    
+    if (is_wp_error($response) || wp_remote_retrieve_response_code($response) != 200) {
+        return null;
+    }
+    
+    return wp_remote_retrieve_body($response);
+}
+
 // AJAX callback to execute python script, and return response
 function generate_ontology_visualizer_callback() {
     check_ajax_referer('ontology_visualizer_nonce', 'nonce');
@@ -486,15 +507,20 @@ function generate_ontology_visualizer_callback() {
         wp_send_json_error('Domain is required');
     }
     
-    // Set up Python
-    // Paths may differ based on server
-    $python_path = 'python3'; 
-    $script_path = plugin_dir_path(__FILE__) . 'ontology_generator.py';
-    
-    // Build and escape for security purposes
-    $command = escapeshellcmd($python_path . ' ' . $script_path . ' ' . escapeshellarg($domain));
+    // Prefer the long-running generator server when one is configured
+    $output = ontology_visualizer_request_server($domain);
     
-    $output = shell_exec($command);
+    if (!$output) {
+        // Set up Python
+        // Paths may differ based on server
+        $python_path = 'python3'; 
+        $script_path = plugin_dir_path(__FILE__) . 'ontology_generator.py';
+        
+        // Build and escape for security purposes
+        $command = escapeshellcmd($python_path . ' ' . $script_path . ' ' . escapeshellarg($domain));
+        
+        $output = shell_exec($command);
+    }
     
     // ERROR generating ontology
     if (!$output) {
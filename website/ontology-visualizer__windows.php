@@ -734,6 +734,9 @@ function ontology_visualizer_shortcode() {
 
     <script>
         jQuery(document).ready(function($) {
+            // Domain of the ontology on display, used to fetch relationship details on demand
+            var currentDomain = '';
+            
             // Initialize Mermaid
             mermaid.initialize({
                 startOnLoad: true,
@@ -756,6 +759,7 @@ function ontology_visualizer_shortcode() {
                 $('#visualization-container').hide();
                 
                 var domain = $('#domain').val();
+                currentDomain = domain;
                 
                 // Make AJAX call to script
                 $.ajax({
@@ -785,6 +789,63 @@ function ontology_visualizer_shortcode() {
                 });
             });
             
+            // Builds the contents of a relationship's details section
+            function renderDetails(rel) {
+                var html = '';
+                
+                // From entity definition
+                html += '<div class="detail-section">';
+                html += '<h4>' + rel.from + '</h4>';
+                if (rel.details && rel.details.from_definition) {
+                    html += '<p>' + rel.details.from_definition + '</p>';
+                } else {
+                    html += '<p>No definition available.</p>';
+                }
+                html += '</div>';
+                
+                // To entity definition
+                html += '<div class="detail-section">';
+                html += '<h4>' + rel.to + '</h4>';
+                if (rel.details && rel.details.to_definition) {
+                    html += '<p>' + rel.details.to_definition + '</p>';
+                } else {
+                    html += '<p>No definition available.</p>';
+                }
+                html += '</div>';
+                
+                // Relationship explanation
+                html += '<div class="detail-section">';
+                html += '<h4>Relationship: ' + rel.relationship + '</h4>';
+                if (rel.details && rel.details.relationship_explanation) {
+                    html += '<p>' + rel.details.relationship_explanation + '</p>';
+                } else {
+                    html += '<p>No explanation available.</p>';
+                }
+                html += '</div>';
+                
+                // Examples
+                if (rel.details && rel.details.examples && rel.details.examples.length > 0) {
+                    html += '<div class="detail-section">';
+                    html += '<h4>Examples:</h4>';
+                    html += '<ul class="examples-list">';
+                    rel.details.examples.forEach(function(example) {
+                        html += '<li>' + example + '</li>';
+                    });
+                    html += '</ul>';
+                    html += '</div>';
+                }
+                
+                // Significance (new section)
+                if (rel.details && rel.details.significance) {
+                    html += '<div class="detail-section">';
+                    html += '<h4>Significance:</h4>';
+                    html += '<p>' + rel.details.significance + '</p>';
+                    html += '</div>';
+                }
+                
+                return html;
+            }
+            
             function displayRelationships(ontology) {
                 // Data validation
                 var domainText = "Unknown Domain";
@@ -849,55 +910,7 @@ function ontology_visualizer_shortcode() {
                         // Add the details section (initially hidden)
                         html += '<div class="relationship-details">';
                         
-                        // From entity definition
-                        html += '<div class="detail-section">';
-                        html += '<h4>' + rel.from + '</h4>';
-                        if (rel.details && rel.details.from_definition) {
-                            html += '<p>' + rel.details.from_definition + '</p>';
-                        } else {
-                            html += '<p>No definition available.</p>';
-                        }
-                        html += '</div>';
-                        
-                        // To entity definition
-                        html += '<div class="detail-section">';
-                        html += '<h4>' + rel.to + '</h4>';
-                        if (rel.details && rel.details.to_definition) {
-                            html += '<p>' + rel.details.to_definition + '</p>';
-                        } else {
-                            html += '<p>No definition available.</p>';
-                        }
-                        html += '</div>';
-                        
-                        // Relationship explanation
-                        html += '<div class="detail-section">';
-                        html += '<h4>Relationship: ' + rel.relationship + '</h4>';
-                        if (rel.details && rel.details.relationship_explanation) {
-                            html += '<p>' + rel.details.relationship_explanation + '</p>';
-                        } else {
-                            html += '<p>No explanation available.</p>';
-                        }
-                        html += '</div>';
-                        
-                        // Examples
-                        if (rel.details && rel.details.examples && rel.details.examples.length > 0) {
-                            html += '<div class="detail-section">';
-                            html += '<h4>Examples:</h4>';
-                            html += '<ul class="examples-list">';
-                            rel.details.examples.forEach(function(example) {
-                                html += '<li>' + example + '</li>';
-                            });
-                            html += '</ul>';
-                            html += '</div>';
-                        }
-                        
-                        // Significance (new section)
-                        if (rel.details && rel.details.significance) {
-                            html += '<div class="detail-section">';
-                            html += '<h4>Significance:</h4>';
-                            html += '<p>' + rel.details.significance + '</p>';
-                            html += '</div>';
-                        }
+                        html += renderDetails(rel);
                         
                         html += '</div>'; // End of details
                         html += '</div>'; // End of relationship item
@@ -928,7 +941,42 @@ function ontology_visualizer_shortcode() {
                 // Make relationship items clickable to show/hide details
                 $('.relationship-item').click(function() {
                     $(this).toggleClass('active');
-                    $(this).find('.relationship-details').toggleClass('active');
+                    var $details = $(this).find('.relationship-details');
+                    $details.toggleClass('active');
+                    
+                    // Servers started with --lazy return relationships without details;
+                    // fetch them the first time a relationship is opened
+                    var rel = relationships[$(this).data('index')];
+                    if (rel.details || $details.data('loading')) {
+                        return;
+                    }
+                    $details.data('loading', true);
+                    $details.html('<p>Loading details...</p>');
+                    
+                    $.ajax({
+                        url: '<?php echo admin_url('admin-ajax.php'); ?>',
+                        type: 'POST',
+                        data: {
+                            action: 'ontology_visualizer_details',
+                            domain: currentDomain,
+                            from: rel.from,
+                            relationship: rel.relationship,
+                            to: rel.to,
+                            nonce: '<?php echo wp_create_nonce('ontology_visualizer_nonce'); ?>'
+                        },
+                        success: function(response) {
+                            if (response.success) {
+                                rel.details = response.data;
+                            }
+                            $details.html(renderDetails(rel));
+                        },
+                        error: function() {
+                            $details.html(renderDetails(rel));
+                        },
+                        complete: function() {
+                            $details.data('loading', false);
+                        }
+                    });
                 });
             }
             
@@ -1174,6 +1222,28 @@ function ontology_visualizer_enqueue_scripts() {
 add_action('wp_enqueue_scripts', 'ontology_visualizer_enqueue_scripts');
 
 
+// Ask a running generator daemon (ontology_generator.py --serve) for an ontology,
+// or for relationship details with $path 'details'; $extra is merged into the request.
+// Enable by defining ONTOLOGY_GENERATOR_SERVER_URL in wp-config.php, e.g. 'http://127.0.0.1:8765'.
+// Returns the raw JSON body, or null so the caller can fall back to running the script.
+function ontology_visualizer_request_server($domain, $path = 'generate', $extra = array()) {
+    if (!defined('ONTOLOGY_GENERATOR_SERVER_URL') || !ONTOLOGY_GENERATOR_SERVER_URL) {
+        return null;
+    }
+    
+    $response = wp_remote_post(trailingslashit(ONTOLOGY_GENERATOR_SERVER_URL) . $path, array(
+        'timeout' => 300,
+        'headers' => array('Content-Type' => 'application/json'),
+        'body'    => wp_json_encode(array_merge(array('domain' => $domain), $extra)),
+    ));
+    
+    if (is_wp_error($response) || wp_remote_retrieve_response_code($response) != 200) {
+        return null;
+    }
+    
+    return wp_remote_retrieve_body($response);
+}
+
 // AJAX callback to execute python script, and return response
 function generate_ontology_visualizer_callback() {
     check_ajax_referer('ontology_visualizer_nonce', 'nonce');
@@ -1184,15 +1254,20 @@ function generate_ontology_visualizer_callback() {
         wp_send_json_error('Domain is required');
     }
     
-    // Set up Python
-    // Paths may differ based on server
-    $python_path = 'python'; 
-    $script_path = plugin_dir_path(__FILE__) . 'ontology_generator.py';
+    // Prefer the long-running generator server when one is configured
+    $output = ontology_visualizer_request_server($domain);
     
-    // Build and escape for security purposes
-    $command = escapeshellcmd($python_path . ' ' . $script_path . ' ' . escapeshellarg($domain));
-    
-    $output = shell_exec($command);
+    if (!$output) {
+        // Set up Python
+        // Paths may differ based on server
+        $python_path = 'python'; 
+        $script_path = plugin_dir_path(__FILE__) . 'ontology_generator.py';
+        
+        // Build and escape for security purposes
+        $command = escapeshellcmd($python_path . ' ' . $script_path . ' ' . escapeshellarg($domain));
+        
+        $output = shell_exec($command);
+    }
     
     // ERROR generating ontology
     if (!$output) {
@@ -1233,6 +1308,47 @@ function generate_ontology_visualizer_callback() {
 add_action('wp_ajax_generate_ontology_visualizer', 'generate_ontology_visualizer_callback');
 add_action('wp_ajax_nopriv_generate_ontology_visualizer', 'generate_ontology_visualizer_callback');
 
+// AJAX callback returning the details of one relationship, for ontologies
+// generated without them (generator server started with --lazy)
+function ontology_visualizer_details_callback() {
+    check_ajax_referer('ontology_visualizer_nonce', 'nonce');
+    
+    $domain = sanitize_text_field($_POST['domain']);
+    $relationship = array(
+        'from'         => sanitize_text_field($_POST['from']),
+        'relationship' => sanitize_text_field($_POST['relationship']),
+        'to'           => sanitize_text_field($_POST['to']),
+    );
+    
+    if (empty($domain) || empty($relationship['from']) || empty($relationship['to'])) {
+        wp_send_json_error('Domain and relationship are required');
+    }
+    
+    $output = ontology_visualizer_request_server($domain, 'details', array('relationships' => array($relationship)));
+    
+    if (!$output) {
+        $python_path = 'python';
+        $script_path = plugin_dir_path(__FILE__) . 'ontology_generator.py';
+        $edge = $relationship['from'] . '|' . $relationship['relationship'] . '|' . $relationship['to'];
+        
+        // escapeshellcmd would mangle the '|' separators, so only the executable part goes through it
+        $command = escapeshellcmd($python_path . ' ' . $script_path) . ' ' . escapeshellarg($domain) . ' --details ' . escapeshellarg($edge);
+        
+        $output = shell_exec($command);
+    }
+    
+    $result = $output ? json_decode($output, true) : null;
+    
+    if (!$result || empty($result['relationships'][0]['details'])) {
+        wp_send_json_error(isset($result['error']) ? $result['error'] : 'Failed to fetch relationship details.');
+        return;
+    }
+    wp_send_json_success($result['relationships'][0]['details']);
+}
+
+add_action('wp_ajax_ontology_visualizer_details', 'ontology_visualizer_details_callback');
+add_action('wp_ajax_nopriv_ontology_visualizer_details', 'ontology_visualizer_details_callback');
+
 
 // ====== ADMIN INTERFACE ====================
 